@@ -0,0 +1,183 @@
+#
+# Offline end-to-end recording benchmark against bench/fake_radiko.py
+#
+# Every configuration runs the real recording path (auth, catalog, guide, stream XML,
+# chunked HLS download, journal, remux) in a fresh process and working directory,
+# and reports wall time, throughput, CPU time, peak RSS and bytes written to disk
+# (by the process and its ffmpeg, from the block I/O counters).
+#
+# Usage:
+#   python bench/bench_recording.py
+#   python bench/bench_recording.py --minutes 30 60 300 --chunk 150 300 --concurrency 1 4 8 \
+#       --latency 0.05 --bandwidth 500000 --fail-rate 0.002 --auto-tune on off --spool memory disk
+#
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# Used when ffmpeg is not installed: copies the ADTS input so the rest of the path still runs
+STAND_IN_FFMPEG = """#!{python}
+import shutil, sys
+args = sys.argv[1:]
+source = args[args.index("-i") + 1]
+with (sys.stdin.buffer if source == "pipe:0" else open(source, "rb")) as src, open(args[-1], "wb") as dst:
+    shutil.copyfileobj(src, dst)
+"""
+
+
+def stand_in_ffmpeg(directory):
+    path = os.path.join(directory, "ffmpeg")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(STAND_IN_FFMPEG.format(python=sys.executable))
+    os.chmod(path, 0o755)
+    return path
+
+
+def run_worker(args):
+    import resource
+    from radirec.batch import BatchScheduler
+    from radirec.recorder import RecordingJob
+
+    config = {
+        "radiko_url": args.server,
+        "radiko_api_url": args.server,
+        "concurrency": args.concurrency,
+        "chunk_seconds": args.chunk,
+        "ffmpeg_path": args.ffmpeg,
+        "metrics_file": "metrics.jsonl",
+        "auto_tune": args.auto_tune == "on",
+        "spool": args.spool,
+    }
+    job = RecordingJob(station_id="TBS", from_time="202601010500", duration_min=args.minutes)
+    started = time.perf_counter()
+    BatchScheduler(config, max_jobs=1, log=lambda message: None).run([job])
+    wall = time.perf_counter() - started
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    size = os.path.getsize(job.output) if job.output else 0
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    rss_kib = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    with open("metrics.jsonl", encoding="utf-8") as f:
+        tuning = json.loads(f.readline()).get("tuning", {})
+    print(json.dumps({
+        "status": job.status,
+        "final_concurrency": tuning.get("concurrency"),
+        "final_chunk": tuning.get("chunk_seconds"),
+        "error": job.error,
+        "wall": wall,
+        "bytes": size,
+        "cpu": usage.ru_utime + usage.ru_stime,
+        "rss_kib": rss_kib,
+        # ru_oublock counts 512 byte blocks written through to the device
+        "written": (usage.ru_oublock + children.ru_oublock) * 512,
+    }))
+
+
+def run_case(server_url, minutes, chunk, concurrency, auto_tune, spool, ffmpeg):
+    work = tempfile.mkdtemp(prefix="radirec_bench_")
+    try:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--server", server_url,
+               "--minutes", str(minutes), "--chunk", str(chunk), "--concurrency", str(concurrency),
+               "--auto-tune", auto_tune, "--spool", spool, "--ffmpeg", ffmpeg]
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+        proc = subprocess.run(cmd, cwd=work, capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            return {"status": "crashed", "error": proc.stderr.strip().splitlines()[-1:]}
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def print_row(result):
+    prefix = (f"{result['minutes']:4} {result['chunk']:5} {result['concurrency']:4} {result['auto_tune']:>4} "
+              f"{result['spool']:>6}")
+    if result["status"] == "crashed":
+        print(f"{prefix} crashed  {result['error']}")
+        return
+    mib_s = result["bytes"] / result["wall"] / 1048576 if result["wall"] else 0
+    print(f"{prefix} {result['final_concurrency'] or '-':>6} {result['final_chunk'] or '-':>7} {result['status']:>7} "
+          f"{result['wall']:8.2f} {mib_s:7.2f} {result['cpu']:7.2f} {result['rss_kib'] / 1024:8.1f} "
+          f"{result['written'] / max(result['bytes'], 1):6.2f}x "
+          f"{result['requests']:6} {result['connections']:6}"
+          + (f"  {result['error']}" if result["status"] != "done" else ""))
+
+
+def main():
+    from radirec.config import SPOOL
+    parser = argparse.ArgumentParser(description="Offline RadiRec recording benchmark")
+    parser.add_argument("--minutes", type=int, nargs="+", default=[30, 60, 180, 300])
+    parser.add_argument("--chunk", type=int, nargs="+", default=[300])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--auto-tune", nargs="+", choices=["on", "off"], default=["on", "off"],
+                        help="adapt chunk length/concurrency during the download")
+    parser.add_argument("--spool", nargs="+", choices=["memory", "tmpfs", "disk"], default=[SPOOL],
+                        help="where chunks wait for the muxer")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/s per response (0 = unlimited)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of a 500 on HLS requests")
+    parser.add_argument("--endpoint-fail-rate", type=float, nargs="+", default=[0.0],
+                        help="one HLS endpoint per value, with this extra failure probability")
+    parser.add_argument("--ffmpeg", help="ffmpeg to remux with (default: the one RadiRec finds)")
+    parser.add_argument("--output", help="also write the results as JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.minutes, args.chunk, args.concurrency = args.minutes[0], args.chunk[0], args.concurrency[0]
+        args.auto_tune, args.spool = args.auto_tune[0], args.spool[0]
+        run_worker(args)
+        return
+
+    from fake_radiko import start_server
+    from radirec.recorder import find_ffmpeg
+
+    tools = tempfile.mkdtemp(prefix="radirec_bench_tools_")
+    ffmpeg = args.ffmpeg or find_ffmpeg()
+    if not shutil.which(ffmpeg):
+        print("ffmpeg not found, remuxing with a copying stand-in")
+        ffmpeg = stand_in_ffmpeg(tools)
+
+    server, state = start_server(latency=args.latency, bandwidth=args.bandwidth, fail_rate=args.fail_rate,
+                                 endpoint_fail_rates=args.endpoint_fail_rate)
+    server_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"server {server_url}  latency {args.latency}s  bandwidth {args.bandwidth or 'unlimited'}  "
+          f"fail-rate {args.fail_rate}  endpoints {args.endpoint_fail_rate}")
+    print(f"{'min':>4} {'chunk':>5} {'conc':>4} {'tune':>4} {'spool':>6} {'->conc':>6} {'->chunk':>7} {'status':>7} "
+          f"{'wall s':>8} {'MiB/s':>7} {'cpu s':>7} {'rss MiB':>8} {'write':>7} {'reqs':>6} {'conns':>6}")
+
+    results = []
+    try:
+        for minutes in args.minutes:
+            for chunk in args.chunk:
+                for concurrency in args.concurrency:
+                    for tune in args.auto_tune:
+                        for spool in args.spool:
+                            requests, connections = state.requests, state.connections
+                            result = run_case(server_url, minutes, chunk, concurrency, tune, spool, ffmpeg)
+                            result.update(minutes=minutes, chunk=chunk, concurrency=concurrency, auto_tune=tune,
+                                          spool=spool, requests=state.requests - requests,
+                                          connections=state.connections - connections)
+                            results.append(result)
+                            print_row(result)
+    finally:
+        server.shutdown()
+        shutil.rmtree(tools, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#
+# Micro-benchmark: buffered ET.fromstring vs streaming iterparse for the radiko XML feeds
+#
+# Usage:
+#   python bench/bench_xml_parse.py                      # generated fixtures
+#   python bench/bench_xml_parse.py full.xml JP13.xml TBS  # saved feeds
+#
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from radirec.catalog import StationCatalog
+from radirec.guide import ProgramGuide
+
+
+def make_station_fixture(path, regions=8, per_region=15):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<region>\n')
+        for r in range(regions):
+            f.write(f'<stations ascii_name="REGION{r}" region_id="r{r}">\n')
+            for i in range(per_region):
+                sid = f"ST{r:02d}{i:02d}"
+                f.write(f"<station><id>{sid}</id><name>放送局{sid}</name><ascii_name>{sid}</ascii_name>"
+                        f"<area_id>JP{r + 1}</area_id><timefree>1</timefree>"
+                        + "".join(f'<logo width="{w}" height="{w // 2}">https://radiko.jp/v2/static/station/logo/{sid}/{w}x{w // 2}.png</logo>'
+                                  for w in (124, 258, 448, 600))
+                        + "</station>\n")
+            f.write("</stations>\n")
+        f.write("</region>\n")
+
+
+def make_guide_fixture(path, stations=15, progs=40):
+    info = "<![CDATA[" + "番組の詳細情報です。" * 60 + "]]>"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<radiko><stations>\n')
+        for s in range(stations):
+            f.write(f'<station id="ST{s:02d}"><name>放送局{s}</name><progs><date>20260101</date>\n')
+            for p in range(progs):
+                ft = 50000 + p * 3000
+                f.write(f'<prog id="{s}{p}" ft="20260101{ft // 100:04d}00" to="20260101{(ft + 3000) // 100:04d}00" '
+                        f'ftl="0500" tol="0530" dur="1800"><title>番組{p}</title><pfm>出演者{p}</pfm>'
+                        f"<desc>{info}</desc><info>{info}</info><url>https://example.com/{p}</url></prog>\n")
+            f.write("</progs></station>\n")
+        f.write("</stations></radiko>\n")
+
+
+def measure(func, repeat=20):
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000, peak / 1024
+
+
+def old_stations(path):
+    with open(path, "rb") as f:
+        root = ET.fromstring(f.read())
+    return [(s.find("id").text, s.find("name").text, s.find("area_id").text)
+            for s in root.findall(".//station") if s.find("timefree").text == "1"]
+
+
+def new_stations(path):
+    catalog = StationCatalog()
+    with open(path, "rb") as f:
+        catalog._parse(f)
+    return catalog.stations
+
+
+def old_guide(path, station_id):
+    with open(path, "rb") as f:
+        root = ET.fromstring(f.read())
+    station = root.find(f".//station[@id='{station_id}']")
+    return [(p.get("ft"), p.get("to"), p.find("title").text) for p in station.findall(".//prog")]
+
+
+def new_guide(path, station_id):
+    return ProgramGuide(None)._parse_station(path, station_id)
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    if len(sys.argv) == 4:
+        station_xml, guide_xml, station_id = sys.argv[1:]
+    else:
+        station_xml = os.path.join(tmp, "full.xml")
+        guide_xml = os.path.join(tmp, "guide.xml")
+        make_station_fixture(station_xml)
+        make_guide_fixture(guide_xml)
+        station_id = "ST03"
+
+    print(f"station list: {os.path.getsize(station_xml) / 1024:.0f} KiB, "
+          f"guide: {os.path.getsize(guide_xml) / 1024:.0f} KiB")
+    rows = [
+        ("stations  fromstring", lambda: old_stations(station_xml)),
+        ("stations  iterparse ", lambda: new_stations(station_xml)),
+        ("guide     fromstring", lambda: old_guide(guide_xml, station_id)),
+        ("guide     iterparse ", lambda: new_guide(guide_xml, station_id)),
+    ]
+    for name, func in rows:
+        ms, peak_kib = measure(func)
+        print(f"{name}: {ms:8.2f} ms  peak {peak_kib:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#
+# Local stand-in for the radiko endpoints used by RadiRec, for offline benchmarks
+#
+# Serves auth1/auth2, member login, the station list, area program guides, the stream XML
+# and a time-free HLS playlist with generated AAC (ADTS) segments on one or more endpoints
+# (/tf/, /tf1/, ...). Latency, bandwidth and failures (also per endpoint) can be injected.
+#
+# Usage:
+#   python bench/fake_radiko.py --port 8080 --latency 0.05 --bandwidth 2000000 --fail-rate 0.01
+#   python bench/fake_radiko.py --endpoint-fail-rate 0.2 0  # two endpoints, the first one flaky
+#
+
+import os
+import sys
+import gzip
+import functools
+import json
+import time
+import random
+import base64
+import struct
+import argparse
+import datetime
+import threading
+import urllib.parse
+import http.server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from radirec.config import AUTHKEY_VALUE
+
+STATIONS = [("TBS", "TBSラジオ", "JP13"), ("QRR", "文化放送", "JP13"), ("LFR", "ニッポン放送", "JP13"),
+            ("ABC", "ABCラジオ", "JP27"), ("MBS", "MBSラジオ", "JP27")]
+SEGMENT_SECONDS = 5
+# 48 kbps AAC at 48 kHz: 1024 samples per frame, about 128 bytes per frame
+FRAME_PAYLOAD = 121
+FRAMES_PER_SEGMENT = SEGMENT_SECONDS * 48000 // 1024
+
+
+def adts_frame(payload_len=FRAME_PAYLOAD, sr_index=3, stamp=b""):
+    # `stamp` starts the (otherwise silent) payload
+    n = 7 + payload_len
+    header = bytes([0xFF, 0xF1, (1 << 6) | (sr_index << 2), 0x80 | ((n >> 11) & 0x03),
+                    (n >> 3) & 0xFF, ((n & 0x07) << 5) | 0x1F, 0xFC])
+    return header + stamp + bytes(payload_len - len(stamp))
+
+
+@functools.lru_cache(maxsize=4096)
+def segment(seek, index):
+    # Segment `index` of the chunk starting at `seek`. Every frame is stamped with the seconds
+    # from 2000-01-01 to the start of its segment and its number in it, so tests can check order
+    start = datetime.datetime.strptime(seek, "%Y%m%d%H%M%S") - datetime.datetime(2000, 1, 1)
+    second = int(start.total_seconds()) + index * SEGMENT_SECONDS
+    return id3_tag() + b"".join(adts_frame(stamp=struct.pack(">IH", second, frame))
+                                for frame in range(FRAMES_PER_SEGMENT))
+
+
+def id3_tag():
+    # ID3v2.4 header with a 20 byte body, like radiko's timestamp PRIV frame
+    return b"ID3\x04\x00\x00\x00\x00\x00\x14" + bytes(20)
+
+
+
+class FakeRadiko:
+    def __init__(self, latency=0.0, bandwidth=0, fail_rate=0.0, endpoint_fail_rates=(0.0,), seed=1):
+        self.latency = latency
+        self.bandwidth = bandwidth # bytes per second per response, 0 = unlimited
+        self.fail_rate = fail_rate
+        # One HLS endpoint per entry, each failing at fail_rate plus its own rate
+        self.endpoint_fail_rates = list(endpoint_fail_rates)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+
+    def should_fail(self, endpoint=0):
+        rate = self.fail_rate + self.endpoint_fail_rates[endpoint]
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    def endpoint_prefix(self, endpoint):
+        return "/tf/" if endpoint == 0 else f"/tf{endpoint}/"
+
+
+def make_handler(state):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per request
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, body, content_type="application/xml", status=200, headers=None):
+            headers = dict(headers or {})
+            # Compress the XML/JSON APIs like the real servers do
+            if body and content_type != "audio/aac" and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            if state.bandwidth:
+                # Throttle in 16 KiB blocks
+                block = 16384
+                for i in range(0, len(body), block):
+                    self.wfile.write(body[i:i + block])
+                    time.sleep(min(block, len(body) - i) / state.bandwidth)
+            else:
+                self.wfile.write(body)
+            with state.lock:
+                state.bytes_sent += len(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            self.do_GET()
+
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+            if state.latency:
+                time.sleep(state.latency)
+            url = urllib.parse.urlsplit(self.path)
+            qs = dict(urllib.parse.parse_qsl(url.query))
+            path = url.path
+            host = f"http://{self.headers.get('Host')}"
+
+            if path == "/v2/api/auth1":
+                token = base64.b64encode(os.urandom(16)).decode()
+                offset, length = random.randint(0, 20), 16
+                with state.lock:
+                    state.tokens[token] = base64.b64encode(AUTHKEY_VALUE[offset:offset + length].encode()).decode()
+                self.send_body(b"", "text/plain", headers={"X-Radiko-AuthToken": token, "X-Radiko-KeyOffset": str(offset),
+                                                           "X-Radiko-KeyLength": str(length)})
+            elif path == "/v2/api/auth2":
+                token = self.headers.get("X-Radiko-AuthToken")
+                with state.lock:
+                    expected = state.tokens.get(token)
+                if expected is None or expected != self.headers.get("X-Radiko-PartialKey"):
+                    self.send_body(b"", "text/plain", status=401)
+                else:
+                    self.send_body("JP13,東京都,tokyo Japan\r\n".encode(), "text/plain")
+            elif path == "/v4/api/member/login":
+                self.send_body(json.dumps({"radiko_session": "fake-session"}).encode(), "application/json")
+            elif path == "/v3/station/region/full.xml":
+                self.send_body(self.station_list())
+            elif path.startswith("/program/v3/date/"):
+                parts = path.split("/")
+                self.send_body(self.guide(parts[4], parts[6].replace(".xml", "")))
+            elif path.startswith("/v3/station/stream/pc_html5/"):
+                self.send_body(self.stream_xml(host))
+            elif path.startswith("/tf"):
+                self.hls(path, url.query, qs, host)
+            else:
+                self.send_body(b"", "text/plain", status=404)
+
+        def hls(self, path, query, qs, host):
+            # /tf/... is endpoint 0, /tf1/... endpoint 1 and so on
+            name, _, rest = path[1:].partition("/")
+            endpoint = 0 if name == "tf" else int(name[2:]) if name[2:].isdigit() else -1
+            if not 0 <= endpoint < len(state.endpoint_fail_rates):
+                self.send_body(b"", "text/plain", status=404)
+            elif not self.authorized():
+                self.send_body(b"", "text/plain", status=403)
+            elif state.should_fail(endpoint):
+                self.send_body(b"", "text/plain", status=500)
+            elif rest == "playlist.m3u8":
+                body = (f"#EXTM3U\n#EXT-X-STREAM-INF:PROGRAM-ID=1,BANDWIDTH=52973\n"
+                        f"{host}{state.endpoint_prefix(endpoint)}chunklist.m3u8?{query}\n")
+                self.send_body(body.encode(), "application/vnd.apple.mpegurl")
+            elif rest == "chunklist.m3u8":
+                count = -(-int(qs.get("l", "300")) // SEGMENT_SECONDS)
+                lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}"]
+                for i in range(count):
+                    lines += [f"#EXTINF:{SEGMENT_SECONDS},", f"segment/{qs.get('seek', '0')}/{i}.aac"]
+                lines.append("#EXT-X-ENDLIST")
+                self.send_body(("\n".join(lines) + "\n").encode(), "application/vnd.apple.mpegurl")
+            elif rest.startswith("segment/"):
+                _, seek, index = rest.split("/")
+                self.send_body(segment(seek, int(index.split(".")[0])), "audio/aac")
+            else:
+                self.send_body(b"", "text/plain", status=404)
+
+        def authorized(self):
+            with state.lock:
+                return self.headers.get("X-Radiko-AuthToken") in state.tokens
+
+        def station_list(self):
+            rows = "".join(f"<station><id>{sid}</id><name>{name}</name><area_id>{area}</area_id>"
+                           f"<timefree>1</timefree></station>" for sid, name, area in STATIONS)
+            return f'<?xml version="1.0" encoding="UTF-8"?><region><stations>{rows}</stations></region>'.encode()
+
+        def guide(self, date_str, area):
+            # One-hour programs from 05:00 to 29:00
+            day = datetime.datetime.strptime(date_str, "%Y%m%d").replace(hour=5)
+            stations = []
+            for sid, name, st_area in STATIONS:
+                if st_area != area:
+                    continue
+                progs = []
+                for h in range(24):
+                    ft = (day + datetime.timedelta(hours=h)).strftime("%Y%m%d%H%M%S")
+                    to = (day + datetime.timedelta(hours=h + 1)).strftime("%Y%m%d%H%M%S")
+                    progs.append(f'<prog ft="{ft}" to="{to}"><title>{name} {h + 5}時の番組</title>'
+                                 f'<pfm>出演者{h}</pfm><info>番組情報</info></prog>')
+                stations.append(f'<station id="{sid}"><name>{name}</name><progs><date>{date_str}</date>'
+                                f'{"".join(progs)}</progs></station>')
+            return f'<?xml version="1.0" encoding="UTF-8"?><radiko><stations>{"".join(stations)}</stations></radiko>'.encode()
+
+        def stream_xml(self, host):
+            urls = "".join(f'<url areafree="{af}" timefree="1"><playlist_create_url>'
+                           f'{host}{state.endpoint_prefix(i)}playlist.m3u8</playlist_create_url></url>'
+                           for af in ("0", "1") for i in range(len(state.endpoint_fail_rates)))
+            return f'<?xml version="1.0" encoding="UTF-8"?><urls>{urls}</urls>'.encode()
+
+    return Handler
+
+
+def start_server(port=0, **options):
+    state = FakeRadiko(**options)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local radiko stand-in server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/s per response (0 = unlimited)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of a 500 on HLS requests")
+    parser.add_argument("--endpoint-fail-rate", type=float, nargs="+", default=[0.0],
+                        help="one HLS endpoint per value, with this extra failure probability")
+    args = parser.parse_args()
+    server, _ = start_server(args.port, latency=args.latency, bandwidth=args.bandwidth, fail_rate=args.fail_rate,
+                             endpoint_fail_rates=args.endpoint_fail_rate)
+    print(f"fake radiko on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""RadiRec core: radiko time-free recording without the GUI.
+
+    from radirec import BatchScheduler, RecordingJob
+    jobs = BatchScheduler(config).run([RecordingJob(url="https://radiko.jp/#!/ts/TBS/20260101050000")])
+
+Submodules are imported on first attribute access, so `import radirec` stays cheap.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "RadikoAuth": "auth",
+    "StationCatalog": "catalog",
+    "ProgramGuide": "guide",
+    "ConnectionPool": "net",
+    "HlsDownloader": "hls",
+    "ChunkJournal": "journal",
+    "StreamMuxer": "mux",
+    "RecordingLibrary": "library",
+    "ProgramSearch": "search",
+    "Recorder": "recorder",
+    "RecordingJob": "recorder",
+    "parse_job_line": "recorder",
+    "BatchScheduler": "batch",
+    "run_batch": "batch",
+    "read_config": "config",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,164 @@
+"""radiko login and auth1/auth2 handshake with a shared, cached session."""
+
+import os
+import json
+import time
+import base64
+import threading
+
+from .config import AUTHKEY_VALUE, AUTH_CACHE_FILE, AUTH_TTL, RADIKO_URL
+
+
+class RadikoAuth:
+    """Thread-safe cache of the radiko login session and auth token (optionally persisted to disk).
+
+    The handshake runs under a lock, so parallel chunk workers wait for one
+    login/auth1/auth2 instead of each starting their own.
+    """
+
+    def __init__(self, http_request, log, cache_file=AUTH_CACHE_FILE, ttl=AUTH_TTL, base_url=RADIKO_URL):
+        self.http_request = http_request
+        self.base_url = base_url
+        self.log = log
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.mail = None
+        self.password = None
+        self.account = None # credentials and endpoint the token was issued for, see account_key
+        self.authtoken = None
+        self.area_id = None
+        self.radiko_session = None
+        self.expires = 0
+        self.load_cache()
+
+    def load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            self.mail = cache.get('mail')
+            self.account = cache.get('account')
+            self.authtoken = cache.get('authtoken')
+            self.area_id = cache.get('area_id')
+            self.radiko_session = cache.get('radiko_session')
+            self.expires = cache.get('expires', 0)
+        except Exception as e:
+            print(f"Auth cache load error: {e}")
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        cache = {
+            'mail': self.mail,
+            'account': self.account,
+            'authtoken': self.authtoken,
+            'area_id': self.area_id,
+            'radiko_session': self.radiko_session,
+            'expires': self.expires
+        }
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=4)
+        except Exception as e:
+            print(f"Auth cache save error: {e}")
+
+    def account_key(self, mail, password):
+        # Server and credentials a token belongs to; a hash, so the password is not written to disk
+        import hashlib
+        return hashlib.sha256(f"{self.base_url}\n{mail or ''}\n{password or ''}".encode('utf-8')).hexdigest()
+
+    def is_valid(self, account):
+        return self.authtoken is not None and time.time() < self.expires and self.account == account
+
+    def ensure(self, mail, password):
+        # Reuse the cached token while it is valid for the same server and credentials, otherwise
+        # log in again. A token from a failed premium login is not reused, so login is retried
+        with self.lock:
+            account = self.account_key(mail, password)
+            # Kept for refresh(); the password itself is never cached
+            self.password = password
+            if self.is_valid(account) and (self.radiko_session or not (mail and password)):
+                return True
+            self.mail = mail or None
+            self.account = account
+            return self._authenticate()
+
+    def refresh(self, stale_token):
+        # Called when a request was rejected with 401/403.
+        # Only the first caller holding the stale token re-authenticates, the others reuse its result.
+        with self.lock:
+            if self.authtoken != stale_token and self.is_valid(self.account):
+                return True
+            return self._authenticate()
+
+    def hls_headers(self):
+        return {"X-Radiko-AuthToken": self.authtoken, "X-Radiko-AreaId": self.area_id}
+
+    def _authenticate(self):
+        self.authtoken = None
+        self.expires = 0
+        self.radiko_session = None
+        if self.mail and self.password:
+            if not self._login(self.mail, self.password):
+                self.log("プレミアムログインに失敗しました。通常モードで続行します。")
+                self.radiko_session = None
+        if not self._authorize():
+            return False
+        self.expires = time.time() + self.ttl
+        self.save_cache()
+        return True
+
+    def _login(self, mail, password):
+        self.log("ログイン中...")
+        try:
+            url = f"{self.base_url}/v4/api/member/login"
+            data = {"mail": mail, "pass": password}
+            content, _ = self.http_request(url, data=data, method='POST', endpoint="login")
+            res = json.loads(content)
+            if res.get("radiko_session"):
+                self.radiko_session = res["radiko_session"]
+                return True
+        except Exception as e:
+            self.log(f"ログインエラー: {e}")
+        return False
+
+    def _authorize(self):
+        self.log("認証中...")
+        try:
+            # Auth 1
+            headers = {
+                'X-Radiko-App': 'pc_html5',
+                'X-Radiko-App-Version': '0.0.1',
+                'X-Radiko-Device': 'pc',
+                'X-Radiko-User': 'dummy_user'
+            }
+            _, res_headers = self.http_request(f"{self.base_url}/v2/api/auth1", headers=headers, endpoint="auth1")
+            
+            authtoken = res_headers.get('X-Radiko-AuthToken')
+            keyoffset = int(res_headers.get('X-Radiko-KeyOffset'))
+            keylength = int(res_headers.get('X-Radiko-KeyLength'))
+            
+            # Partial key
+            partial_key = base64.b64encode(AUTHKEY_VALUE[keyoffset:keyoffset+keylength].encode('utf-8')).decode('utf-8')
+            
+            # Auth 2
+            headers = {
+                'X-Radiko-Device': 'pc',
+                'X-Radiko-User': 'dummy_user',
+                'X-Radiko-AuthToken': authtoken,
+                'X-Radiko-PartialKey': partial_key
+            }
+            auth2_url = f"{self.base_url}/v2/api/auth2"
+            if self.radiko_session:
+                auth2_url += f"?radiko_session={self.radiko_session}"
+            
+            content, _ = self.http_request(auth2_url, headers=headers, endpoint="auth2")
+            self.authtoken = authtoken
+            self.area_id = content.decode('utf-8').split(',')[0].strip()
+            self.log(f"認証成功 (Area: {self.area_id})")
+            return True
+        except Exception as e:
+            self.log(f"認証エラー: {e}")
+        return False
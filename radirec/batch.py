@@ -0,0 +1,165 @@
+"""Batch scheduler and the headless command line entry point."""
+
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (DEFAULT_BATCH_JOBS, DEFAULT_TEMPLATE, DEFAULT_CONCURRENCY, HLS_POOL_SIZE, METRICS_FILE,
+                     CHUNK_SECONDS, SPOOL, POSTPROCESS_WORKERS, LIBRARY_FILE, SEARCH_LIMIT, RADIKO_URL,
+                     RADIKO_API_URL, read_config, tuning_options)
+from .net import ConnectionPool
+from .auth import RadikoAuth
+from .catalog import StationCatalog, StationStreams
+from .guide import ProgramGuide
+from .recorder import Recorder, parse_job_line, find_ffmpeg
+from .postprocess import PostProcessor
+from .library import RecordingLibrary
+from .search import ProgramSearch
+
+
+class BatchScheduler:
+    """Runs recording jobs, at most `max_jobs` at once, sharing one auth session,
+    catalog, guide and connection pool (which also caps requests per host)."""
+
+    def __init__(self, config, max_jobs=DEFAULT_BATCH_JOBS, per_host=HLS_POOL_SIZE, log=print):
+        self.config = config
+        self.max_jobs = max_jobs
+        self.log = log
+        self.base_url = config.get('radiko_url', RADIKO_URL)
+        # One pool for the API calls and the HLS downloads of every job
+        self.pool = ConnectionPool(max_per_host=per_host)
+        self.catalog = StationCatalog(opener=self.pool.open, base_url=self.base_url, log=log)
+        self.guide = ProgramGuide(self.catalog, opener=self.pool.open,
+                                  api_url=config.get('radiko_api_url', RADIKO_API_URL))
+        self.auth = RadikoAuth(self.pool.request, log, base_url=self.base_url)
+        self.streams = StationStreams(self.pool.request, base_url=self.base_url)
+        self.library = None
+        if config.get('library_file', LIBRARY_FILE):
+            self.library = RecordingLibrary(config.get('library_file', LIBRARY_FILE), log=log)
+        self.post = None
+        if config.get('postprocess'):
+            self.post = PostProcessor(find_ffmpeg(config.get('ffmpeg_path')), config['postprocess'], self.catalog,
+                                      workers=config.get('postprocess_workers', POSTPROCESS_WORKERS), log=log)
+
+    def make_recorder(self, job):
+        prefix = f"[{job.label}] "
+        return Recorder(self.auth, self.catalog, self.guide, self.pool,
+                        lambda message: self.log(prefix + message),
+                        template=self.config.get('template', DEFAULT_TEMPLATE),
+                        concurrency=self.config.get('concurrency', DEFAULT_CONCURRENCY),
+                        metrics_file=self.config.get('metrics_file', METRICS_FILE),
+                        prometheus_file=self.config.get('prometheus_file'),
+                        chunk_seconds=self.config.get('chunk_seconds', CHUNK_SECONDS),
+                        ffmpeg_path=self.config.get('ffmpeg_path'),
+                        base_url=self.base_url,
+                        spool=self.config.get('spool', SPOOL),
+                        spool_dir=self.config.get('spool_dir'),
+                        library=self.library,
+                        streams=self.streams,
+                        **tuning_options(self.config))
+
+    def run_job(self, job):
+        self.make_recorder(job).record(job, self.config.get('mail', ''), self.config.get('password', ''))
+        if self.post:
+            # Queued for the worker processes; this job slot is free for the next download
+            self.post.submit(job)
+        self.log(f"[{job.label}] {job.status} ({job.elapsed:.1f}s)")
+        return job
+
+    def run(self, jobs):
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+                list(executor.map(self.run_job, jobs))
+        finally:
+            self.pool.close()
+            if self.library:
+                self.library.close()
+            if self.post:
+                self.post.shutdown(wait=True)
+        return jobs
+
+    @staticmethod
+    def summary(jobs):
+        lines = [f"{'status':8} {'time':>8}  job"]
+        for job in jobs:
+            detail = job.output if job.status == "done" else job.error
+            if job.skipped:
+                detail = f"録音済み {job.output}"
+            elif job.parts:
+                detail = f"{detail} ({sum(1 for part in job.parts if part.status == 'done')}/{len(job.parts)}番組)"
+            lines.append(f"{job.status:8} {job.elapsed:7.1f}s  {job.label}  {detail or ''}")
+        done = sum(1 for job in jobs if job.status == "done")
+        lines.append(f"{done}/{len(jobs)} 件成功")
+        return "\n".join(lines)
+
+
+def run_batch(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="RadiRec_GUI.py", description="RadiRec 一括録音 (GUIなし)")
+    parser.add_argument("jobs", nargs="*", help="番組URL、局ID,開始日時(YYYYMMDDHHMM),録音時間(分) または 局ID,日付(YYYYMMDD)")
+    parser.add_argument("--batch", metavar="FILE", help="ジョブファイル (1行に1件、書式は jobs と同じ)")
+    parser.add_argument("--jobs", dest="max_jobs", type=int, default=DEFAULT_BATCH_JOBS, help="同時録音数")
+    parser.add_argument("--per-host", type=int, default=HLS_POOL_SIZE, help="ホストごとの同時接続数")
+    parser.add_argument("--concurrency", type=int, help="録音ごとの同時ダウンロード数")
+    parser.add_argument("--summary", metavar="FILE", help="結果をJSONで書き出すファイル")
+    parser.add_argument("--rebuild-library", action="store_true", help="放送局フォルダを走査して録音ライブラリを作り直す")
+    parser.add_argument("--search", metavar="QUERY", help="過去7日分の全エリアの番組表から番組を検索し、ジョブ形式で出力する")
+    args = parser.parse_args(argv)
+    config = read_config()
+
+    if args.search:
+        return search_programs(config, args.search)
+
+    if args.rebuild_library:
+        library = RecordingLibrary(config.get('library_file') or LIBRARY_FILE)
+        library.scan(template=config.get('template', DEFAULT_TEMPLATE))
+        library.close()
+        if not args.jobs and not args.batch:
+            return 0
+
+    lines = list(args.jobs)
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            lines.extend(f.read().splitlines())
+    try:
+        jobs = [job for job in map(parse_job_line, lines) if job]
+    except ValueError as e:
+        parser.error(str(e))
+    if not jobs:
+        parser.error("ジョブがありません")
+
+    if args.concurrency:
+        config['concurrency'] = args.concurrency
+    scheduler = BatchScheduler(config, max_jobs=max(1, args.max_jobs), per_host=max(1, args.per_host))
+    scheduler.run(jobs)
+
+    print(BatchScheduler.summary(jobs))
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump([job.to_dict() for job in jobs], f, ensure_ascii=False, indent=4)
+    return 0 if all(job.status == "done" for job in jobs) else 1
+
+
+def search_programs(config, query):
+    # Hits are printed as job lines (with a comment above each), ready for a --batch file
+    import datetime
+    base_url = config.get('radiko_url', RADIKO_URL)
+    log = lambda message: print(message, file=sys.stderr)
+    pool = ConnectionPool()
+    catalog = StationCatalog(opener=pool.open, base_url=base_url, log=log)
+    guide = ProgramGuide(catalog, opener=pool.open, api_url=config.get('radiko_api_url', RADIKO_API_URL))
+    search = ProgramSearch(catalog, guide, log=log)
+    try:
+        search.build()
+    finally:
+        pool.close()
+    started = time.perf_counter()
+    hits = search.search(query, SEARCH_LIMIT)
+    print(f"{len(hits)}件 ({(time.perf_counter() - started) * 1000:.1f}ms)", file=sys.stderr)
+    for prog in hits:
+        ft = datetime.datetime.strptime(prog["ft"], "%Y%m%d%H%M%S")
+        minutes = int((datetime.datetime.strptime(prog["to"], "%Y%m%d%H%M%S") - ft).total_seconds() // 60)
+        print(f"# {ft:%Y/%m/%d %H:%M} {prog['station_id']} {prog['title']}")
+        print(f"{prog['station_id']} {prog['ft'][:12]} {minutes}")
+    return 0 if hits else 1
@@ -0,0 +1,150 @@
+"""Station catalog (v3/station/region/full.xml) with an on-disk cache, and per-station stream XML."""
+
+import os
+import json
+import time
+import threading
+import urllib.error
+
+from .config import CACHE_DIR, CATALOG_MAX_AGE, STREAM_XML_MAX_AGE, RADIKO_URL
+from .net import http_open, http_request, TeeReader
+from .metrics import record_request
+
+
+class StationCatalog:
+    """Station list from full.xml, cached on disk and indexed by station id and area.
+
+    The feed is revalidated with ETag/If-Modified-Since at most once per CATALOG_MAX_AGE,
+    and parsed incrementally while it is being downloaded. If revalidation fails, the cached
+    copy is used until the next check.
+    """
+
+    def __init__(self, opener=http_open, cache_dir=CACHE_DIR, max_age=CATALOG_MAX_AGE, base_url=RADIKO_URL,
+                 log=print):
+        self.opener = opener
+        self.log = log
+        self.url = f"{base_url}/v3/station/region/full.xml"
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.xml_path = os.path.join(cache_dir, "stations.xml")
+        self.meta_path = os.path.join(cache_dir, "stations.json")
+        self.lock = threading.Lock()
+        self.checked_at = 0
+        self.stations = [] # timefree stations in feed order
+        self.by_id = {} # station id -> {"id", "name", "area_id", "timefree"}
+        self.by_area = {} # area id -> [station id, ...]
+
+    def load(self, force=False):
+        with self.lock:
+            if self.by_id and not force and time.time() - self.checked_at < self.max_age:
+                return
+            meta = {}
+            if os.path.exists(self.meta_path) and os.path.exists(self.xml_path):
+                try:
+                    with open(self.meta_path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    # Unreadable: revalidate without ETag/Last-Modified
+                    meta = {}
+
+            if meta and not force and time.time() - meta.get("checked_at", 0) < self.max_age:
+                with open(self.xml_path, 'rb') as f:
+                    self._parse(f)
+            else:
+                headers = {}
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+                started = time.perf_counter()
+                try:
+                    try:
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                        with self.opener(self.url, headers) as res, open(self.xml_path + ".part", 'wb') as f:
+                            meta = {"etag": res.headers.get("ETag"), "last_modified": res.headers.get("Last-Modified")}
+                            self._parse(TeeReader(res, f))
+                        os.replace(self.xml_path + ".part", self.xml_path)
+                        record_request("station_list", time.perf_counter() - started,
+                                       os.path.getsize(self.xml_path), getattr(res, "reused", False))
+                    except urllib.error.HTTPError as e:
+                        if e.code != 304:
+                            raise
+                        # Not modified: keep using the cached copy
+                        record_request("station_list", time.perf_counter() - started, 0)
+                        with open(self.xml_path, 'rb') as f:
+                            self._parse(f)
+                    meta["checked_at"] = time.time()
+                    with open(self.meta_path, 'w', encoding='utf-8') as f:
+                        json.dump(meta, f, indent=4)
+                except Exception as e:
+                    if os.path.exists(self.xml_path + ".part"):
+                        os.remove(self.xml_path + ".part")
+                    if not os.path.exists(self.xml_path):
+                        raise
+                    # Network error or server outage: the cached copy is still good enough.
+                    # Checked again after max_age (or at the next launch, as the meta is not updated)
+                    self.log(f"放送局一覧の更新に失敗したため保存済みの一覧を使用します: {e}")
+                    with open(self.xml_path, 'rb') as f:
+                        self._parse(f)
+                    meta = {"checked_at": time.time()}
+
+            self.checked_at = meta["checked_at"]
+
+    def _parse(self, stream):
+        import xml.etree.ElementTree as ET
+        stations = []
+        by_id = {}
+        by_area = {}
+        for _, elem in ET.iterparse(stream, events=("end",)):
+            if elem.tag != "station":
+                continue
+            entry = {
+                "id": elem.findtext("id"),
+                "name": elem.findtext("name"),
+                "area_id": elem.findtext("area_id"),
+                "timefree": elem.findtext("timefree") == "1",
+            }
+            elem.clear()
+            # The same station is listed under several regions, keep the first one
+            if entry["id"] in by_id:
+                continue
+            by_id[entry["id"]] = entry
+            by_area.setdefault(entry["area_id"], []).append(entry["id"])
+            if entry["timefree"]:
+                stations.append(entry)
+        self.stations, self.by_id, self.by_area = stations, by_id, by_area
+
+    def get(self, station_id):
+        self.load()
+        return self.by_id.get(station_id)
+
+    def area_of(self, station_id):
+        station = self.get(station_id)
+        return station["area_id"] if station else None
+
+
+class StationStreams:
+    """Stream XML (v3/station/stream/pc_html5/<station>.xml) per station, kept in memory for max_age.
+
+    Shared by the recorders and the warm-up, so a station's endpoints are fetched once.
+    """
+
+    def __init__(self, request=http_request, max_age=STREAM_XML_MAX_AGE, base_url=RADIKO_URL):
+        self.request = request
+        self.url = base_url + "/v3/station/stream/pc_html5/{station}.xml"
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.station_locks = {}
+        self.cache = {} # station id -> (fetched_at, content)
+
+    def get(self, station_id):
+        with self.lock:
+            station_lock = self.station_locks.setdefault(station_id, threading.Lock())
+        # Concurrent callers for the same station wait for one fetch
+        with station_lock:
+            entry = self.cache.get(station_id)
+            if entry and time.time() - entry[0] < self.max_age:
+                return entry[1]
+            content, _ = self.request(self.url.format(station=station_id), endpoint="stream_xml")
+            self.cache[station_id] = (time.time(), content)
+            return content
@@ -0,0 +1,109 @@
+"""Settings shared by the GUI and the headless recorder."""
+
+import os
+import json
+
+# RadikoConstants
+CONFIG_FILE = 'config.json'
+DEFAULT_TEMPLATE = "{DATE}_{TIME}_{TITLE}"
+# Endpoints ("radiko_url" / "radiko_api_url" in config.json point them elsewhere, e.g. a local test server)
+RADIKO_URL = "https://radiko.jp"
+RADIKO_API_URL = "https://api.radiko.jp"
+# Define authorize key value (from https://radiko.jp/apps/js/playerCommon.js)
+AUTHKEY_VALUE = 'bcd151073c03b352e1ef2fd66c32209da9ca0afa'
+# Chunk download settings
+CHUNK_SECONDS = 300
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+CHUNK_RETRIES = 3
+# Chunk length and concurrency are tuned during the download within these limits
+# ("auto_tune": false in config.json keeps chunk_seconds/concurrency fixed)
+MIN_CHUNK_SECONDS = 60
+MAX_CHUNK_SECONDS = 900
+# Persistent connections kept (and requests in flight allowed) per host; the pool serves the API
+# calls as well as the HLS segment downloads. HLS_TIMEOUT is the read timeout (seconds)
+HLS_POOL_SIZE = 8
+HLS_TIMEOUT = 30
+HTTP_CONNECT_TIMEOUT = 10
+# Connection errors, timeouts and 429/5xx are retried this many times, after
+# HTTP_BACKOFF * 2^n seconds (+-50% jitter, at most HTTP_BACKOFF_MAX)
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+HTTP_BACKOFF_MAX = 8
+# Stream-copy cuts run at once when a station day is split into programs
+SPLIT_WORKERS = 4
+# Recordings run at once in batch mode
+DEFAULT_BATCH_JOBS = 2
+# Where downloaded chunks wait for their turn in the muxer ("spool" in config.json):
+#   "tmpfs"  - files under TMPFS_DIR ("spool_dir" overrides), resumable until reboot
+#              (the system temp folder where there is no /dev/shm)
+#   "disk"   - files under WORK_DIR, kept until the recording succeeds so it can be resumed
+#   "memory" - RAM only, the output file is the only disk write (no resume)
+SPOOL = "tmpfs"
+WORK_DIR = '.radirec_work'
+TMPFS_DIR = '/dev/shm/radirec'
+# The journal keeps every chunk until the recording succeeds; "tmpfs" falls back to "disk"
+# when it has less free space than the whole recording (48 kbps AAC) times the headroom
+SPOOL_BYTES_PER_SECOND = 6000
+SPOOL_TMPFS_HEADROOM = 1.5
+# Downloaded chunks allowed to wait for an earlier, slower one before no new chunk is started
+SPOOL_AHEAD = 8
+# A chunk shorter than its requested length by more than this (seconds) is treated as truncated
+CHUNK_DURATION_TOLERANCE = 6
+# radiko auth tokens are valid for about 70 minutes, refresh a little earlier
+AUTH_CACHE_FILE = 'auth_cache.json'
+AUTH_TTL = 3600
+# Station catalog / program guide cache
+CACHE_DIR = '.radirec_cache'
+CATALOG_MAX_AGE = 86400
+# Guides for today and later can still change; older days are kept as they are
+GUIDE_MAX_AGE = 3600
+# Stream XML (HLS endpoints) of a station, kept in memory
+STREAM_XML_MAX_AGE = 3600
+# Program search: area guides of the last SEARCH_DAYS days (radiko's time-free window) in every
+# area, fetched SEARCH_WORKERS at a time; at most SEARCH_LIMIT hits are returned
+SEARCH_DAYS = 7
+SEARCH_WORKERS = 8
+SEARCH_LIMIT = 200
+# Warm-up at GUI start: auth, station list, ffmpeg and the guide/stream XML of the last
+# RECENT_STATIONS stations recorded; the URL/station fields re-warm WARMUP_DELAY_MS after an edit
+WARMUP_WORKERS = 4
+RECENT_STATIONS = 3
+WARMUP_DELAY_MS = 500
+# One JSON metrics record is appended here per recording ("metrics_file" in config.json, "" to disable).
+# "prometheus_file" additionally writes the last recording in node exporter textfile format.
+METRICS_FILE = 'radirec_metrics.jsonl'
+# Post-processing of finished recordings ("postprocess" in config.json, e.g. ["tag", "mp3"]; off by default)
+POSTPROCESS_WORKERS = 1
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"
+LOUDNORM_BITRATE = "128k"
+MP3_QUALITY = 2
+# Index of finished recordings; a program already in it is not downloaded again
+# ("library_file" in config.json, "" to disable)
+LIBRARY_FILE = 'radirec_library.sqlite3'
+# GUI log: drained from the worker queue every LOG_POLL_MS, the widget keeps the last LOG_MAX_LINES lines.
+# Set "log_file" in config.json to also keep the full log in a rotating file.
+LOG_POLL_MS = 100
+LOG_MAX_LINES = 1000
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+
+def read_config():
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Config load error: {e}")
+    return {}
+
+
+def tuning_options(config):
+    # Recorder keyword arguments for the adaptive chunk/concurrency limits
+    return {
+        "auto_tune": config.get('auto_tune', True),
+        "max_concurrency": config.get('max_concurrency', MAX_CONCURRENCY),
+        "min_chunk_seconds": config.get('min_chunk_seconds', MIN_CHUNK_SECONDS),
+        "max_chunk_seconds": config.get('max_chunk_seconds', MAX_CHUNK_SECONDS),
+    }
@@ -0,0 +1,567 @@
+"""Tk front end: a thin adapter that turns widget values into jobs for Recorder."""
+
+import json
+import queue
+import datetime
+import threading
+import tkinter as tk
+import tkinter.ttk as ttk
+
+from .config import (DEFAULT_TEMPLATE, DEFAULT_CONCURRENCY, MAX_CONCURRENCY, CONFIG_FILE, LOG_POLL_MS,
+                     LOG_MAX_LINES, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS, METRICS_FILE, SPOOL, POSTPROCESS_WORKERS,
+                     LIBRARY_FILE, RECENT_STATIONS, WARMUP_DELAY_MS, RADIKO_URL, RADIKO_API_URL, read_config,
+                     tuning_options)
+from .net import ConnectionPool
+from .auth import RadikoAuth
+from .catalog import StationCatalog, StationStreams
+from .guide import ProgramGuide
+from .recorder import Recorder, RecordingJob, find_ffmpeg, parse_program_url
+from .warmup import Warmup
+from .search import ProgramSearch
+from .postprocess import PostProcessor
+from .library import RecordingLibrary
+
+
+class RadikoRecorderGUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("RadiRec GUI v1.0")
+        self.root.geometry("620x700")
+
+        # Variables
+        self.mode_var = tk.StringVar(value="url")
+        self.station_var = tk.StringVar()
+        self.start_time_var = tk.StringVar(value=datetime.datetime.now().strftime("%Y%m%d%H%M"))
+        self.duration_var = tk.StringVar(value="60")
+        self.url_var = tk.StringVar()
+        self.mail_var = tk.StringVar()
+        self.pass_var = tk.StringVar()
+        self.filename_template_var = tk.StringVar(value=DEFAULT_TEMPLATE)
+        self.concurrency_var = tk.StringVar(value=str(DEFAULT_CONCURRENCY))
+        self.progress_var = tk.StringVar()
+        self.post_var = tk.StringVar()
+
+        # Worker threads never touch widgets: log lines and progress go through this queue
+        self.events = queue.Queue()
+        self.log_max_lines = LOG_MAX_LINES
+        self.file_logger = None
+        self.metrics_file = METRICS_FILE
+        self.prometheus_file = None
+        self.tuning = tuning_options({})
+        self.spool = SPOOL
+        self.spool_dir = None
+        self.post = None
+        self.last_post = "" # step timings of the last finished post-processing
+        self.library = None
+        self.search_window = None
+        self.ffmpeg_path = None
+        self.recent_stations = [] # most recent first
+        self.warm_after = None # pending re-warm of the URL/station fields
+        self.program_window = None
+        self.search_state = "empty" # empty / building / ready
+        # Recordings run one after another; 録音開始 and the program search both queue here
+        self.jobs = queue.Queue()
+        self.jobs_worker = None
+        
+        # The endpoints are fixed for the session: the shared objects below are built with them
+        config = read_config()
+        self.base_url = config.get('radiko_url', RADIKO_URL)
+        self.pool = ConnectionPool(max_per_host=MAX_CONCURRENCY)
+        self.catalog = StationCatalog(opener=self.pool.open, base_url=self.base_url, log=self.log)
+        self.guide = ProgramGuide(self.catalog, opener=self.pool.open,
+                                  api_url=config.get('radiko_api_url', RADIKO_API_URL))
+        self.auth = RadikoAuth(self.pool.request, self.log, base_url=self.base_url)
+        self.streams = StationStreams(self.pool.request, base_url=self.base_url)
+        self.warmup = Warmup(self.auth, self.catalog, self.guide, self.streams, self.log)
+        self.search = ProgramSearch(self.catalog, self.guide, log=self.log)
+
+        self.load_config()
+        self.create_widgets()
+        self.root.after(LOG_POLL_MS, self.pump_events)
+
+        # Authenticate, load the station list and fetch the recent stations' guides in the
+        # background, so 録音開始 can go straight to the download
+        self.warmup.start(self.mail_var.get(), self.pass_var.get(), self.ffmpeg_path, self.recent_stations,
+                          on_catalog=lambda stations: self.call_in_ui(lambda: self.show_stations(stations)))
+        for var in (self.url_var, self.station_var, self.start_time_var):
+            var.trace_add("write", self.schedule_warm)
+
+        # Save config on close
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def load_config(self):
+        config = read_config()
+        self.mail_var.set(config.get('mail', ''))
+        self.pass_var.set(config.get('password', ''))
+        self.filename_template_var.set(config.get('template', DEFAULT_TEMPLATE))
+        self.concurrency_var.set(str(config.get('concurrency', DEFAULT_CONCURRENCY)))
+        self.log_max_lines = config.get('log_max_lines', LOG_MAX_LINES)
+        self.metrics_file = config.get('metrics_file', METRICS_FILE)
+        self.prometheus_file = config.get('prometheus_file')
+        self.tuning = tuning_options(config)
+        self.spool = config.get('spool', SPOOL)
+        self.spool_dir = config.get('spool_dir')
+        self.ffmpeg_path = config.get('ffmpeg_path')
+        self.recent_stations = config.get('recent_stations', [])[:RECENT_STATIONS]
+        if config.get('library_file', LIBRARY_FILE):
+            self.library = RecordingLibrary(config.get('library_file', LIBRARY_FILE), log=self.log)
+        if config.get('postprocess'):
+            try:
+                self.post = PostProcessor(find_ffmpeg(config.get('ffmpeg_path')), config['postprocess'], self.catalog,
+                                          workers=config.get('postprocess_workers', POSTPROCESS_WORKERS),
+                                          log=self.log, on_status=self.on_post_status)
+            except ValueError as e:
+                self.log(f"後処理の設定エラー: {e}")
+        if config.get('log_file'):
+            self.file_logger = self.open_log_file(config['log_file'])
+
+    def open_log_file(self, path):
+        import logging
+        import logging.handlers
+        logger = logging.getLogger("radirec.gui")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES,
+                                                       backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        return logger
+
+    def save_config(self):
+        # Keep settings that have no widget (e.g. ones only used by batch mode)
+        config = read_config()
+        config.update({
+            'mail': self.mail_var.get(),
+            'password': self.pass_var.get(),
+            'template': self.filename_template_var.get(),
+            'concurrency': self.get_concurrency(),
+            'recent_stations': self.recent_stations
+        })
+        try:
+            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+                json.dump(config, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            print(f"Config save error: {e}")
+
+    def on_close(self):
+        self.save_config()
+        self.warmup.shutdown()
+        if self.post:
+            # Files already being processed are finished, queued ones are dropped
+            self.post.shutdown(wait=False, cancel=True)
+        self.root.destroy()
+
+    def create_widgets(self):
+        # Mode Selection
+        frame_mode = ttk.LabelFrame(self.root, text="モード選択", padding=10)
+        frame_mode.pack(fill="x", padx=10, pady=5)
+        ttk.Radiobutton(frame_mode, text="URLから録音", variable=self.mode_var, value="url", command=self.toggle_mode).pack(side="left", padx=5)
+        ttk.Radiobutton(frame_mode, text="日時指定録音", variable=self.mode_var, value="manual", command=self.toggle_mode).pack(side="left", padx=5)
+        ttk.Radiobutton(frame_mode, text="1日分録音", variable=self.mode_var, value="day", command=self.toggle_mode).pack(side="left", padx=5)
+
+        # Manual Recording Frame
+        self.frame_manual = ttk.LabelFrame(self.root, text="録音設定", padding=10)
+        self.frame_manual.pack(fill="x", padx=10, pady=5)
+
+        ttk.Label(self.frame_manual, text="放送局:").grid(row=0, column=0, sticky="e", padx=5, pady=2)
+        self.combo_station = ttk.Combobox(self.frame_manual, textvariable=self.station_var, width=30, state="readonly")
+        self.combo_station.grid(row=0, column=1, padx=5, pady=2)
+        ttk.Button(self.frame_manual, text="放送局一覧取得", command=self.get_stations_thread).grid(row=0, column=2, padx=5, pady=2)
+
+        ttk.Label(self.frame_manual, text="開始日時 (YYYYMMDDHHMM):").grid(row=1, column=0, sticky="e", padx=5, pady=2)
+        ttk.Entry(self.frame_manual, textvariable=self.start_time_var).grid(row=1, column=1, sticky="w", padx=5, pady=2)
+        ttk.Button(self.frame_manual, text="現在時刻", command=self.set_now).grid(row=1, column=2, padx=5, pady=2)
+
+        ttk.Label(self.frame_manual, text="録音時間 (分):").grid(row=2, column=0, sticky="e", padx=5, pady=2)
+        ttk.Entry(self.frame_manual, textvariable=self.duration_var, width=10).grid(row=2, column=1, sticky="w", padx=5, pady=2)
+
+        # URL Recording Frame
+        self.frame_url = ttk.LabelFrame(self.root, text="URL設定", padding=10)
+
+        ttk.Label(self.frame_url, text="番組URL:").grid(row=0, column=0, sticky="e", padx=5, pady=2)
+        ttk.Entry(self.frame_url, textvariable=self.url_var, width=50).grid(row=0, column=1, padx=5, pady=2)
+        ttk.Button(self.frame_url, text="クリップボードから貼り付け", command=self.paste_url).grid(row=0, column=2, padx=5, pady=2)
+
+        # Config / Naming Options
+        frame_opts = ttk.LabelFrame(self.root, text="設定・オプション", padding=10)
+        frame_opts.pack(fill="x", padx=10, pady=5)
+
+        ttk.Label(frame_opts, text="メールアドレス:").grid(row=0, column=0, sticky="e", padx=5, pady=2)
+        ttk.Entry(frame_opts, textvariable=self.mail_var, width=30).grid(row=0, column=1, sticky="w", padx=5, pady=2)
+
+        ttk.Label(frame_opts, text="パスワード:").grid(row=1, column=0, sticky="e", padx=5, pady=2)
+        ttk.Entry(frame_opts, textvariable=self.pass_var, show="*", width=30).grid(row=1, column=1, sticky="w", padx=5, pady=2)
+
+        ttk.Label(frame_opts, text="ファイル名規則:").grid(row=2, column=0, sticky="e", padx=5, pady=2)
+        ttk.Entry(frame_opts, textvariable=self.filename_template_var, width=40).grid(row=2, column=1, sticky="w", padx=5, pady=2)
+        ttk.Label(frame_opts, text="{DATE}{TIME}{TITLE}{STATION} が使用可能", font=("", 8), foreground="gray").grid(row=3, column=1, sticky="w", padx=5)
+
+        ttk.Label(frame_opts, text="同時ダウンロード数:").grid(row=4, column=0, sticky="e", padx=5, pady=2)
+        ttk.Spinbox(frame_opts, textvariable=self.concurrency_var, from_=1, to=MAX_CONCURRENCY, width=5).grid(row=4, column=1, sticky="w", padx=5, pady=2)
+
+        # LOG
+        frame_log = ttk.LabelFrame(self.root, text="実行ログ", padding=10)
+        frame_log.pack(fill="both", expand=True, padx=10, pady=5)
+        self.text_log = tk.Text(frame_log, height=12)
+        self.text_log.pack(fill="both", expand=True)
+
+        # Progress
+        frame_progress = ttk.Frame(self.root, padding=(10, 0))
+        frame_progress.pack(fill="x", padx=10)
+        self.progress_bar = ttk.Progressbar(frame_progress, mode="determinate")
+        self.progress_bar.pack(side="left", fill="x", expand=True)
+        ttk.Label(frame_progress, textvariable=self.progress_var, width=12).pack(side="left", padx=5)
+        if self.post:
+            ttk.Label(self.root, textvariable=self.post_var, foreground="gray").pack(fill="x", padx=20)
+
+        # Run Button
+        frame_run = ttk.Frame(self.root)
+        frame_run.pack(pady=10)
+        ttk.Button(frame_run, text="録音開始", command=self.run_recording_thread).pack(side="left", padx=5)
+        ttk.Button(frame_run, text="番組検索", command=self.open_program_search).pack(side="left", padx=5)
+        if self.library:
+            ttk.Button(frame_run, text="ライブラリ検索", command=self.open_library).pack(side="left", padx=5)
+        
+        self.toggle_mode()
+
+    def toggle_mode(self):
+        if self.mode_var.get() in ("manual", "day"):
+            self.frame_url.pack_forget()
+            self.frame_manual.pack(fill="x", padx=10, pady=5, after=self.root.children.get("!labelframe"))
+        else:
+            self.frame_manual.pack_forget()
+            self.frame_url.pack(fill="x", padx=10, pady=5, after=self.root.children.get("!labelframe"))
+
+    def set_now(self):
+        self.start_time_var.set(datetime.datetime.now().strftime("%Y%m%d%H%M"))
+
+    def get_concurrency(self):
+        try:
+            return min(MAX_CONCURRENCY, max(1, int(self.concurrency_var.get())))
+        except ValueError:
+            return DEFAULT_CONCURRENCY
+
+    def paste_url(self):
+        try:
+            clipboard = self.root.clipboard_get()
+            self.url_var.set(clipboard)
+            self.log("クリップボードからURLを貼り付けました。")
+        except Exception as e:
+            self.log("クリップボードが空か、読み取りに失敗しました。")
+
+    def log(self, message):
+        # Safe to call from any thread
+        self.events.put(("log", message))
+        if self.file_logger:
+            self.file_logger.info(message)
+
+    def on_progress(self, job, done, total):
+        self.events.put(("progress", done, total))
+
+    def on_post_status(self, depth, result):
+        self.events.put(("post", depth, result))
+
+    def call_in_ui(self, callback):
+        # Run callback on the Tk thread at the next pump
+        self.events.put(("call", callback))
+
+    def pump_events(self):
+        # Drain everything queued since the last tick and update the widgets once
+        lines = []
+        progress = None
+        try:
+            while True:
+                try:
+                    event = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                if event[0] == "log":
+                    lines.append(event[1])
+                elif event[0] == "progress":
+                    progress = event[1:]
+                else:
+                    # A failing callback (e.g. for a window closed meanwhile) must not stop the pump
+                    try:
+                        if event[0] == "post":
+                            self.show_post_status(*event[1:])
+                        else:
+                            event[1]()
+                    except Exception as e:
+                        self.log(f"画面更新エラー: {e}")
+
+            if lines:
+                self.text_log.insert(tk.END, "\n".join(lines) + "\n")
+                # Keep only the most recent lines
+                excess = int(self.text_log.index("end-1c").split(".")[0]) - 1 - self.log_max_lines
+                if excess > 0:
+                    self.text_log.delete("1.0", f"{excess + 1}.0")
+                self.text_log.see(tk.END)
+            if progress:
+                done, total = progress
+                self.progress_bar.configure(maximum=max(total, 1), value=done)
+                self.progress_var.set(f"{done // 60}/{total // 60}分")
+        finally:
+            self.root.after(LOG_POLL_MS, self.pump_events)
+
+    def show_post_status(self, depth, result):
+        text = f"後処理: 待ち {depth}件"
+        if result:
+            self.last_post = ", ".join(f"{step} {seconds:.1f}秒" for step, seconds in result["timings"].items())
+        if self.last_post:
+            text += f" | 前回: {self.last_post}"
+        self.post_var.set(text)
+
+    def get_stations_thread(self):
+        threading.Thread(target=self.get_stations, daemon=True).start()
+
+    def get_stations(self):
+        self.log("放送局情報を取得中...")
+        try:
+            self.catalog.load()
+            stations = self.catalog.stations
+            self.call_in_ui(lambda: self.show_stations(stations))
+            self.log(f"{len(stations)} 局を取得しました。")
+        except Exception as e:
+            self.log(f"放送局取得エラー: {e}")
+
+    def show_stations(self, stations):
+        display_values = [f"{st['id']} : {st['name']}" for st in stations]
+        self.combo_station.configure(values=display_values)
+        if display_values and not self.station_var.get():
+            # Start with the station recorded last
+            ids = [st['id'] for st in stations]
+            recent = [ids.index(sid) for sid in self.recent_stations if sid in ids]
+            self.combo_station.current(recent[0] if recent else 0)
+
+    def schedule_warm(self, *_):
+        # Re-warm once the field has not changed for WARMUP_DELAY_MS
+        if self.warm_after is not None:
+            self.root.after_cancel(self.warm_after)
+        self.warm_after = self.root.after(WARMUP_DELAY_MS, self.warm_selection)
+
+    def warm_selection(self):
+        self.warm_after = None
+        if self.mode_var.get() == "url":
+            parsed = parse_program_url(self.url_var.get())
+            if parsed:
+                self.warmup.warm_station(*parsed)
+            return
+        sel = self.station_var.get()
+        station_id = sel.split(" : ")[0] if " : " in sel else sel
+        start = self.start_time_var.get()
+        if station_id:
+            self.warmup.warm_station(station_id, start[:8] + "0500" if self.mode_var.get() == "day" else start)
+
+    def remember_station(self, station_id):
+        if station_id:
+            self.recent_stations = ([station_id] + [sid for sid in self.recent_stations
+                                                    if sid != station_id])[:RECENT_STATIONS]
+
+    def run_recording_thread(self):
+        job = self.build_job()
+        if job is None:
+            return
+        self.queue_recording(job)
+
+    def queue_recording(self, job):
+        # Widget values are read here on the Tk thread, the worker only gets plain values
+        recorder = Recorder(self.auth, self.catalog, self.guide, self.pool, self.log,
+                            template=self.filename_template_var.get(), concurrency=self.get_concurrency(),
+                            on_progress=self.on_progress, metrics_file=self.metrics_file,
+                            prometheus_file=self.prometheus_file, spool=self.spool, spool_dir=self.spool_dir,
+                            library=self.library, streams=self.streams, base_url=self.base_url,
+                            ffmpeg_path=self.warmup.ffmpeg_path or self.ffmpeg_path, **self.tuning)
+        busy = self.jobs.unfinished_tasks # queued or recording
+        self.jobs.put((recorder, job, self.mail_var.get(), self.pass_var.get()))
+        if busy:
+            self.log(f"録音を予約しました: {job.label} (先に {busy}件)")
+        if self.jobs_worker is None:
+            self.jobs_worker = threading.Thread(target=self.run_jobs, daemon=True)
+            self.jobs_worker.start()
+
+    def run_jobs(self):
+        while True:
+            recorder, job, mail, password = self.jobs.get()
+            self.call_in_ui(self.reset_progress)
+            try:
+                self.record(recorder, job, mail, password)
+            finally:
+                self.jobs.task_done()
+
+    def reset_progress(self):
+        self.progress_bar.configure(value=0)
+        self.progress_var.set("")
+
+    def record(self, recorder, job, mail, password):
+        # Worker thread: the finished file is only queued, post-processing runs in its own processes
+        recorder.record(job, mail, password)
+        self.call_in_ui(lambda: self.remember_station(job.station_id))
+        if self.post:
+            self.post.submit(job)
+
+    def open_library(self):
+        if self.search_window is not None and self.search_window.winfo_exists():
+            self.search_window.lift()
+            return
+        win = self.search_window = tk.Toplevel(self.root)
+        win.title("ライブラリ検索")
+        win.geometry("620x400")
+        query_var = tk.StringVar()
+        status_var = tk.StringVar()
+
+        frame_query = ttk.Frame(win, padding=10)
+        frame_query.pack(fill="x")
+        entry = ttk.Entry(frame_query, textvariable=query_var)
+        entry.pack(side="left", fill="x", expand=True)
+        ttk.Button(frame_query, text="フォルダを再スキャン",
+                   command=lambda: self.rescan_library(lambda: search())).pack(side="left", padx=5)
+
+        columns = ("date", "station", "title", "minutes")
+        tree = ttk.Treeview(win, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("日時", "放送局", "番組名", "分"), (110, 70, 340, 50)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, stretch=column == "title")
+        tree.pack(fill="both", expand=True, padx=10)
+        ttk.Label(win, textvariable=status_var, foreground="gray").pack(fill="x", padx=10, pady=5)
+        paths = {}
+
+        def search(*_):
+            if not win.winfo_exists():
+                return
+            import time
+            started = time.perf_counter()
+            rows = self.library.search(query_var.get())
+            tree.delete(*tree.get_children())
+            paths.clear()
+            for row in rows:
+                ft = row["ft"]
+                item = tree.insert("", tk.END, values=(f"{ft[:4]}/{ft[4:6]}/{ft[6:8]} {ft[8:10]}:{ft[10:12]}",
+                                                       row["station_id"], row["title"] or "",
+                                                       round((row["duration"] or 0) / 60)))
+                paths[item] = row["path"]
+            status_var.set(f"{len(rows)}件 ({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+        def copy_path(_event):
+            for item in tree.selection():
+                self.root.clipboard_clear()
+                self.root.clipboard_append(paths[item])
+                self.log(f"パスをコピーしました: {paths[item]}")
+
+        query_var.trace_add("write", search)
+        tree.bind("<Double-1>", copy_path)
+        entry.focus_set()
+        search()
+
+    def open_program_search(self):
+        if self.program_window is not None and self.program_window.winfo_exists():
+            self.program_window.lift()
+            return
+        win = self.program_window = tk.Toplevel(self.root)
+        win.title("番組検索 (過去7日・全エリア)")
+        win.geometry("720x420")
+        query_var = tk.StringVar()
+        status_var = tk.StringVar()
+
+        frame_query = ttk.Frame(win, padding=10)
+        frame_query.pack(fill="x")
+        entry = ttk.Entry(frame_query, textvariable=query_var)
+        entry.pack(side="left", fill="x", expand=True)
+        ttk.Button(frame_query, text="番組表を再取得",
+                   command=lambda: self.build_search_index(status_var, search)).pack(side="left", padx=5)
+
+        columns = ("date", "station", "title", "pfm")
+        tree = ttk.Treeview(win, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("日時", "放送局", "番組名", "出演者"), (140, 70, 300, 180)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, stretch=column in ("title", "pfm"))
+        tree.pack(fill="both", expand=True, padx=10)
+        frame_status = ttk.Frame(win, padding=(10, 5))
+        frame_status.pack(fill="x")
+        ttk.Label(frame_status, textvariable=status_var, foreground="gray").pack(side="left")
+        hits = {}
+
+        def search(*_):
+            if self.search_state != "ready" or not win.winfo_exists():
+                return
+            import time
+            started = time.perf_counter()
+            progs = self.search.search(query_var.get())
+            elapsed = (time.perf_counter() - started) * 1000
+            tree.delete(*tree.get_children())
+            hits.clear()
+            for prog in progs:
+                ft, to = prog["ft"], prog["to"]
+                item = tree.insert("", tk.END, values=(f"{ft[:4]}/{ft[4:6]}/{ft[6:8]} {ft[8:10]}:{ft[10:12]}-"
+                                                       f"{to[8:10]}:{to[10:12]}", prog["station_id"],
+                                                       prog["title"], prog["pfm"]))
+                hits[item] = prog
+            status_var.set(f"{len(progs)}件 / {len(self.search.programs)}番組 ({elapsed:.1f}ms)")
+
+        def queue_selected(*_):
+            for item in tree.selection():
+                prog = hits[item]
+                self.queue_recording(RecordingJob(station_id=prog["station_id"], from_time=prog["ft"],
+                                                  to_time=prog["to"]))
+
+        ttk.Button(frame_status, text="選択した番組を録音", command=queue_selected).pack(side="right")
+        query_var.trace_add("write", search)
+        tree.bind("<Double-1>", queue_selected)
+        tree.bind("<Return>", queue_selected)
+        entry.focus_set()
+        if self.search_state == "empty":
+            self.build_search_index(status_var, search)
+        else:
+            search()
+
+    def build_search_index(self, status_var, on_done):
+        # Guides are fetched and indexed on a worker thread; the window only shows the progress
+        if self.search_state == "building":
+            return
+        self.search_state = "building"
+        status_var.set("番組表を取得中...")
+
+        def progress(done, total):
+            self.call_in_ui(lambda: status_var.set(f"番組表を取得中... {done}/{total}"))
+
+        def build():
+            try:
+                self.search.build(on_progress=progress)
+            except Exception as e:
+                self.log(f"番組検索の索引作成エラー: {e}")
+            self.search_state = "ready"
+            self.call_in_ui(on_done)
+
+        threading.Thread(target=build, daemon=True).start()
+
+    def rescan_library(self, on_done):
+        template = self.filename_template_var.get()
+
+        def scan():
+            try:
+                self.library.scan(template=template)
+            except Exception as e:
+                self.log(f"ライブラリ更新エラー: {e}")
+            self.call_in_ui(on_done)
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def build_job(self):
+        if self.mode_var.get() in ("manual", "day"):
+            sel = self.station_var.get()
+            station_id = sel.split(" : ")[0] if " : " in sel else sel
+            if self.mode_var.get() == "day":
+                # 05:00-29:00 of the start date, split into programs afterwards
+                return RecordingJob(station_id=station_id, from_time=self.start_time_var.get()[:8], day=True)
+            try:
+                duration_min = int(self.duration_var.get() or 0)
+            except ValueError:
+                self.log("録音時間が不正です。")
+                return None
+            return RecordingJob(station_id=station_id, from_time=self.start_time_var.get(), duration_min=duration_min)
+        return RecordingJob(url=self.url_var.get())
+
+
+def main():
+    root = tk.Tk()
+    app = RadikoRecorderGUI(root)
+    root.mainloop()
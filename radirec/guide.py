@@ -0,0 +1,136 @@
+"""Area program guides with a per-station interval index."""
+
+import os
+import re
+import time
+import bisect
+import shutil
+import datetime
+import threading
+
+from .config import CACHE_DIR, GUIDE_MAX_AGE, RADIKO_API_URL
+from .net import http_open
+from .metrics import record_request
+
+GUIDE_FILE = re.compile(r"guide_(\d{8})_[^.]+\.xml")
+
+
+class ProgramGuide:
+    """Area program guides cached once per (date, area), with a sorted interval index per station.
+
+    Only the requested station is extracted from a guide; parsing stops at the end of its node.
+    """
+
+    def __init__(self, catalog, opener=http_open, cache_dir=CACHE_DIR, max_age=GUIDE_MAX_AGE,
+                 api_url=RADIKO_API_URL):
+        self.catalog = catalog
+        self.url = api_url + "/program/v3/date/{date}/area/{area}.xml"
+        self.opener = opener
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.fetch_locks = {} # (date, area) -> lock
+        self.index = {} # (date, station id) -> (mtime, starts, progs)
+
+    @staticmethod
+    def guide_date(time_str):
+        # Radiko's day boundary is 5:00 AM.
+        # If the time is between 00:00:00 and 04:59:59, the program belongs to the previous day's XML.
+        dt_base = datetime.datetime.strptime(time_str[:8], "%Y%m%d")
+        if int(time_str[8:12]) < 500:
+            dt_base -= datetime.timedelta(days=1)
+        return dt_base.strftime("%Y%m%d")
+
+    def fetch(self, date_str, area_id):
+        # Make sure the (date, area) guide is on disk and return its path
+        path = os.path.join(self.cache_dir, f"guide_{date_str}_{area_id}.xml")
+        today = self.guide_date(datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
+        with self.lock:
+            fetch_lock = self.fetch_locks.setdefault((date_str, area_id), threading.Lock())
+        # Concurrent callers for the same guide wait for one download; other guides go on
+        with fetch_lock:
+            if os.path.exists(path):
+                if date_str < today or time.time() - os.path.getmtime(path) < self.max_age:
+                    return path
+            os.makedirs(self.cache_dir, exist_ok=True)
+            started = time.perf_counter()
+            # Other processes may share the cache folder; each thread writes its own part file
+            part = f"{path}.{threading.get_ident()}.part"
+            try:
+                with self.opener(self.url.format(date=date_str, area=area_id)) as res, open(part, 'wb') as f:
+                    shutil.copyfileobj(res, f)
+                os.replace(part, path)
+            except Exception:
+                if os.path.exists(part):
+                    os.remove(part)
+                raise
+            record_request("guide", time.perf_counter() - started, os.path.getsize(path),
+                           getattr(res, "reused", False))
+            return path
+
+    def prune(self, oldest_date):
+        # Forget the guides of days before `oldest_date` (YYYYMMDD), on disk and in the index
+        removed = 0
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                match = GUIDE_FILE.fullmatch(name)
+                if match and match.group(1) < oldest_date:
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                        removed += 1
+                    except OSError:
+                        pass
+        with self.lock:
+            for cache in (self.index, self.fetch_locks):
+                for key in [key for key in cache if key[0] < oldest_date]:
+                    del cache[key]
+        return removed
+
+    def _parse_station(self, path, station_id):
+        import xml.etree.ElementTree as ET
+        progs = []
+        inside = False
+        with open(path, 'rb') as f:
+            for event, elem in ET.iterparse(f, events=("start", "end")):
+                if elem.tag == "station":
+                    if event == "start":
+                        inside = elem.get("id") == station_id
+                        continue
+                    elem.clear()
+                    if inside:
+                        break
+                elif event == "end" and elem.tag == "prog":
+                    if inside:
+                        progs.append({
+                            "ft": elem.get("ft"),
+                            "to": elem.get("to"),
+                            "title": elem.findtext("title") or "",
+                        })
+                    elem.clear()
+        progs.sort(key=lambda p: p["ft"])
+        return [p["ft"] for p in progs], progs
+
+    def station_programs(self, station_id, date_str):
+        area_id = self.catalog.area_of(station_id)
+        if not area_id:
+            return [], []
+        key = (date_str, station_id)
+        path = self.fetch(date_str, area_id)
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            entry = self.index.get(key)
+        # Re-index when the cached guide was refreshed
+        if entry is None or entry[0] != mtime:
+            entry = (mtime,) + self._parse_station(path, station_id)
+            with self.lock:
+                self.index[key] = entry
+        return entry[1:]
+
+    def find(self, station_id, time_str):
+        # The program with ft <= time < to, or None
+        if len(time_str) == 12: time_str += "00"
+        starts, progs = self.station_programs(station_id, self.guide_date(time_str))
+        i = bisect.bisect_right(starts, time_str) - 1
+        if i >= 0 and progs[i]["ft"] <= time_str < progs[i]["to"]:
+            return progs[i]
+        return None
@@ -0,0 +1,113 @@
+"""In-process HLS download of radiko time-free streams into raw ADTS data."""
+
+import time
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+ADTS_SAMPLE_RATES = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350]
+
+
+def strip_id3(data):
+    # radiko segments start with an ID3v2 timestamp tag; drop it so the spool stays pure ADTS
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        if data[5] & 0x10:
+            size += 10 # footer present
+        return data[10 + size:]
+    return data
+
+
+def adts_duration(data):
+    # Sum the duration of every ADTS frame (1024 samples per raw data block)
+    seconds = 0.0
+    pos = 0
+    while pos + 7 <= len(data):
+        if data[pos] != 0xFF or (data[pos + 1] & 0xF6) != 0xF0:
+            raise ValueError(f"ADTS sync lost at byte {pos}")
+        sr_index = (data[pos + 2] >> 2) & 0x0F
+        frame_len = ((data[pos + 3] & 0x03) << 11) | (data[pos + 4] << 3) | (data[pos + 5] >> 5)
+        blocks = (data[pos + 6] & 0x03) + 1
+        if frame_len < 7 or sr_index >= len(ADTS_SAMPLE_RATES):
+            raise ValueError(f"Broken ADTS header at byte {pos}")
+        seconds += 1024 * blocks / ADTS_SAMPLE_RATES[sr_index]
+        pos += frame_len
+    return seconds
+
+
+class HlsDownloader:
+    """Fetch a radiko HLS playlist and its AAC segments in-process, returning raw ADTS data."""
+
+    def __init__(self, pool, headers):
+        self.pool = pool
+        self.headers = headers
+
+    def resolve_segments(self, playlist_url, depth=3):
+        text = self.pool.get(playlist_url, self.headers).decode("utf-8", errors="replace")
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if not lines or lines[0] != "#EXTM3U":
+            raise Exception(f"Invalid playlist: {playlist_url}")
+
+        # Master playlist: follow the first variant
+        for i, line in enumerate(lines):
+            if line.startswith("#EXT-X-STREAM-INF"):
+                variants = [l for l in lines[i + 1:] if not l.startswith("#")]
+                if not variants or depth <= 0:
+                    raise Exception(f"No media playlist: {playlist_url}")
+                return self.resolve_segments(urllib.parse.urljoin(playlist_url, variants[0]), depth - 1)
+
+        return [urllib.parse.urljoin(playlist_url, l) for l in lines if not l.startswith("#")]
+
+    def fetch(self, stream_url):
+        segments = self.resolve_segments(stream_url)
+        if not segments:
+            raise Exception("Playlist has no segments")
+        return b"".join(strip_id3(self.pool.get(seg, self.headers)) for seg in segments)
+
+
+class EndpointRanking:
+    """Candidate playlist_create_url endpoints of one recording, best first.
+
+    Ranked by failure ratio, then by the latency of the probe (the first chunk's playlist).
+    Every chunk attempt reports back, so an endpoint that starts failing drops down the list.
+    """
+
+    def __init__(self, urls):
+        self.lock = threading.Lock()
+        self.order = list(dict.fromkeys(urls))
+        self.stats = {url: {"latency": None, "ok": 0, "failed": 0} for url in self.order}
+
+    def _score(self, url):
+        s = self.stats[url]
+        latency = s["latency"] if s["latency"] is not None else float("inf")
+        return (s["failed"] / (s["ok"] + s["failed"] + 1), latency)
+
+    def probe(self, downloader, stream_urls):
+        # stream_urls: endpoint -> the first chunk's stream URL on it. All are probed at once
+        def probe_one(url):
+            started = time.perf_counter()
+            try:
+                if not downloader.resolve_segments(stream_urls[url]):
+                    raise Exception("Playlist has no segments")
+            except Exception as e:
+                self.report(url, False)
+                return url, None, e
+            latency = time.perf_counter() - started
+            with self.lock:
+                self.stats[url]["latency"] = latency
+            self.report(url, True)
+            return url, latency, None
+
+        with ThreadPoolExecutor(max_workers=len(self.order) or 1) as pool:
+            return list(pool.map(probe_one, list(self.order)))
+
+    def report(self, url, ok):
+        with self.lock:
+            self.stats[url]["ok" if ok else "failed"] += 1
+            self.order.sort(key=self._score)
+
+    def pick(self, tried=()):
+        # Best endpoint this chunk has not tried yet; once all were tried, start over
+        with self.lock:
+            candidates = [url for url in self.order if url not in tried] or self.order
+            return candidates[0]
@@ -0,0 +1,135 @@
+"""On-disk journal of downloaded chunks, used to resume recordings."""
+
+import os
+import json
+import shutil
+import threading
+
+from .config import WORK_DIR, TMPFS_DIR, SPOOL_BYTES_PER_SECOND, SPOOL_TMPFS_HEADROOM
+
+
+class ChunkJournal:
+    """On-disk record of validated chunks, keyed by station_id/from_time/to_time."""
+
+    def __init__(self, station_id, from_time, to_time, base_dir=WORK_DIR):
+        self.dir = os.path.join(base_dir, f"{station_id}_{from_time}_{to_time}")
+        self.path = os.path.join(self.dir, "journal.json")
+        self.lock = threading.Lock()
+        self.chunks = {} # seek -> {"seek", "l", "size", "duration"}
+        os.makedirs(self.dir, exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.chunks = json.load(f).get("chunks", {})
+            except Exception:
+                self.chunks = {}
+
+    def chunk_path(self, chunk):
+        return os.path.join(self.dir, f"{chunk['seek']}_{chunk['l']}.aac")
+
+    def is_done(self, chunk):
+        entry = self.chunks.get(chunk["seek"])
+        if entry is None or entry["l"] != chunk["l"]:
+            return False
+        path = self.chunk_path(chunk)
+        return os.path.exists(path) and os.path.getsize(path) == entry["size"]
+
+    def read(self, chunk):
+        with open(self.chunk_path(chunk), "rb") as f:
+            return f.read()
+
+    def length_at(self, seek):
+        # Length of the completed chunk starting at `seek`, so a resume keeps earlier chunk lengths
+        entry = self.chunks.get(seek)
+        if entry is not None and self.is_done(entry):
+            return entry["l"]
+        return None
+
+    def next_seek(self, seek):
+        # Start of the first completed chunk after `seek`, so a new chunk can stop right there
+        with self.lock:
+            entries = sorted((entry for entry in self.chunks.values() if entry["seek"] > seek),
+                             key=lambda entry: entry["seek"])
+        for entry in entries:
+            if self.is_done(entry):
+                return entry["seek"]
+        return None
+
+    def record(self, chunk, data, duration):
+        path = self.chunk_path(chunk)
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+        with self.lock:
+            self.chunks[chunk["seek"]] = {"seek": chunk["seek"], "l": chunk["l"],
+                                          "size": len(data), "duration": round(duration, 3)}
+            with open(self.path + ".part", 'w', encoding='utf-8') as f:
+                json.dump({"chunks": self.chunks}, f, indent=1)
+            os.replace(self.path + ".part", self.path)
+
+    def remove(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class MemoryJournal:
+    """ChunkJournal stand-in that holds chunks in RAM until they are read for the muxer.
+
+    Nothing survives a failed recording, so there is nothing to resume.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {} # seek -> (l, data)
+
+    def is_done(self, chunk):
+        with self.lock:
+            entry = self.data.get(chunk["seek"])
+        return entry is not None and entry[0] == chunk["l"]
+
+    def length_at(self, seek):
+        return None
+
+    def next_seek(self, seek):
+        return None
+
+    def record(self, chunk, data, duration):
+        with self.lock:
+            self.data[chunk["seek"]] = (chunk["l"], data)
+
+    def read(self, chunk):
+        # Released as soon as it is handed over
+        with self.lock:
+            return self.data.pop(chunk["seek"])[1]
+
+    def remove(self):
+        with self.lock:
+            self.data.clear()
+
+
+def dir_size(path):
+    if not os.path.isdir(path):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def open_journal(spool, station_id, from_time, to_time, spool_dir=None, seconds=0, log=print):
+    # "memory" / "tmpfs" / "disk", see SPOOL in config.py. `seconds` is the length of the recording
+    if spool == "memory":
+        return MemoryJournal()
+    if spool == "tmpfs":
+        if spool_dir is None:
+            spool_dir = TMPFS_DIR
+            if not os.path.isdir(os.path.dirname(spool_dir)):
+                import tempfile
+                spool_dir = os.path.join(tempfile.gettempdir(), "radirec")
+        journal = ChunkJournal(station_id, from_time, to_time, base_dir=spool_dir)
+        # Chunks kept from an earlier attempt already have their space
+        needed = seconds * SPOOL_BYTES_PER_SECOND * SPOOL_TMPFS_HEADROOM - dir_size(journal.dir)
+        free = shutil.disk_usage(journal.dir).free
+        if free >= needed:
+            return journal
+        if not journal.chunks:
+            journal.remove()
+        log(f"一時保存先の空き容量が不足しているためディスクに保存します "
+            f"(空き {free / 1024 / 1024:.0f}MB / 必要 {needed / 1024 / 1024:.0f}MB)")
+    return ChunkJournal(station_id, from_time, to_time)
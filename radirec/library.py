@@ -0,0 +1,215 @@
+"""SQLite index of finished recordings, used to skip programs that are already on disk."""
+
+import os
+import re
+import time
+import struct
+import datetime
+import threading
+
+from .config import LIBRARY_FILE, DEFAULT_TEMPLATE
+
+PLACEHOLDERS = {
+    "{DATE}": r"(?P<date>\d{8})",
+    "{TIME}": r"(?P<time>\d{4})",
+    "{TITLE}": r"(?P<title>.+)",
+    "{STATION}": r"(?P<station>[^/\\]+)",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    station_id TEXT NOT NULL,
+    ft TEXT NOT NULL,
+    to_time TEXT NOT NULL,
+    title TEXT,
+    size INTEGER,
+    mtime REAL,
+    duration REAL,
+    checksum TEXT,
+    added_at TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_range ON recordings (station_id, ft);
+"""
+
+
+def m4a_duration(path):
+    # Duration in seconds from the mvhd box, without ffprobe. ffmpeg writes moov at the end
+    # when streaming, so boxes are skipped by their size instead of read
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos + 8 <= end:
+            f.seek(pos)
+            size, kind = struct.unpack(">I4s", f.read(8))
+            header = 8
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+                header = 16
+            elif size == 0:
+                size = end - pos
+            if size < header:
+                break
+            if kind == b"moov":
+                # Descend into moov
+                pos += header
+                continue
+            if kind == b"mvhd":
+                version = f.read(4)[0]
+                if version == 1:
+                    timescale, duration = struct.unpack(">16xIQ", f.read(28))
+                else:
+                    timescale, duration = struct.unpack(">8xII", f.read(16))
+                return duration / timescale if timescale else None
+            pos += size
+    return None
+
+
+def file_checksum(path, block=1024 * 1024):
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(block), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def template_pattern(template):
+    # Filename template -> regex; a placeholder used twice must match the same text
+    parts = []
+    seen = set()
+    for part in re.split(r"(\{DATE\}|\{TIME\}|\{TITLE\}|\{STATION\})", template):
+        if part in PLACEHOLDERS:
+            name = part[1:-1].lower()
+            parts.append(f"(?P={name})" if name in seen else PLACEHOLDERS[part])
+            seen.add(name)
+        else:
+            parts.append(re.escape(part))
+    return re.compile("".join(parts) + r"\.m4a")
+
+
+class RecordingLibrary:
+    """Index of recordings: station, ft/to, title, path, size, duration and checksum.
+
+    Recorder adds every successful recording; scan() (re)builds the index from the station
+    folders. The connection is opened on first use and shared by all threads.
+    """
+
+    def __init__(self, path=LIBRARY_FILE, log=print):
+        self.path = path
+        self.log = log
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            import sqlite3
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+            self.db.executescript(SCHEMA)
+        return self.db
+
+    def add(self, path, station_id, ft, to, title, duration=None, checksum=None):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        if duration is None:
+            duration = m4a_duration(path)
+        entry = (path, station_id, ft, to, title, stat.st_size, stat.st_mtime, duration,
+                 checksum or file_checksum(path), datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
+        with self.lock:
+            db = self._connect()
+            with db:
+                db.execute("INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", entry)
+
+    def add_job(self, job):
+        self.add(job.output, job.station_id, job.from_time, job.to_time, job.title)
+
+    @staticmethod
+    def is_current(entry):
+        # Not touched since it was indexed (post-processing rewrites files in place)
+        try:
+            stat = os.stat(entry["path"])
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]
+
+    def covering(self, station_id, ft, to):
+        # The shortest recording of the station that contains ft..to, or None. Rows whose file
+        # is gone are dropped on the way
+        with self.lock:
+            db = self._connect()
+            rows = db.execute("SELECT * FROM recordings WHERE station_id = ? AND ft <= ? AND to_time >= ? "
+                              "ORDER BY ft DESC, to_time", (station_id, ft, to)).fetchall()
+            for row in rows:
+                if os.path.exists(row["path"]):
+                    return dict(row)
+                with db:
+                    db.execute("DELETE FROM recordings WHERE path = ?", (row["path"],))
+        return None
+
+    def search(self, text="", limit=500):
+        # Every word must appear in the title, station id or date; newest first
+        clauses, args = [], []
+        for word in text.split():
+            clauses.append("(title LIKE ? ESCAPE '\\' OR station_id LIKE ? ESCAPE '\\' OR ft LIKE ? ESCAPE '\\')")
+            pattern = "%" + re.sub(r"([%_\\])", r"\\\1", word) + "%"
+            args += [pattern, pattern, pattern]
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self.lock:
+            db = self._connect()
+            rows = db.execute(f"SELECT * FROM recordings{where} ORDER BY ft DESC LIMIT ?", args + [limit])
+            return [dict(row) for row in rows]
+
+    def scan(self, out_dir=None, template=DEFAULT_TEMPLATE):
+        # Index every <station>/<template>.m4a under out_dir and forget files that are gone.
+        # Files unchanged since they were indexed are not hashed again
+        out_dir = os.path.abspath(out_dir or os.getcwd())
+        pattern = template_pattern(template)
+        started = time.perf_counter()
+        with self.lock:
+            known = {row["path"]: dict(row) for row in self._connect().execute("SELECT * FROM recordings")}
+        found = set()
+        added = skipped = 0 # added counts refreshed entries too
+        for station_id in sorted(os.listdir(out_dir)):
+            station_dir = os.path.join(out_dir, station_id)
+            if not os.path.isdir(station_dir) or station_id.startswith("."):
+                continue
+            for name in os.listdir(station_dir):
+                if not name.endswith(".m4a") or name.endswith(".part.m4a"):
+                    continue
+                path = os.path.join(station_dir, name)
+                found.add(path)
+                entry = known.get(path)
+                if entry and self.is_current(entry):
+                    continue
+                if entry:
+                    # Changed since (e.g. tagged): keep what the recorder knew, refresh the rest
+                    self.add(path, entry["station_id"], entry["ft"], entry["to_time"], entry["title"])
+                    added += 1
+                    continue
+                match = pattern.fullmatch(name)
+                fields = match.groupdict() if match else {}
+                duration = m4a_duration(path) if fields.get("date") and fields.get("time") else None
+                if not duration:
+                    skipped += 1
+                    continue
+                ft = datetime.datetime.strptime(fields["date"] + fields["time"], "%Y%m%d%H%M")
+                # Programs are whole minutes long
+                to = ft + datetime.timedelta(minutes=max(1, round(duration / 60)))
+                self.add(path, station_id, ft.strftime("%Y%m%d%H%M%S"), to.strftime("%Y%m%d%H%M%S"),
+                         fields.get("title"), duration)
+                added += 1
+        gone = [path for path in known if path.startswith(out_dir + os.sep) and path not in found]
+        with self.lock:
+            db = self._connect()
+            with db:
+                db.executemany("DELETE FROM recordings WHERE path = ?", [(path,) for path in gone])
+        self.log(f"ライブラリ更新: 追加 {added}件, 削除 {len(gone)}件, 対象外 {skipped}件 "
+                 f"({time.perf_counter() - started:.1f}秒)")
+        return added, len(gone), skipped
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
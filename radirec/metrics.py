@@ -0,0 +1,165 @@
+"""Per-recording phase timings and transfer counters, exported as JSON and Prometheus text."""
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+# HTTP helpers report to the metrics of the recording running on the current thread
+_current = threading.local()
+
+
+@contextlib.contextmanager
+def observe(metrics):
+    previous = getattr(_current, "metrics", None)
+    _current.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _current.metrics = previous
+
+
+def record_request(endpoint, seconds, nbytes, reused=False):
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        metrics.add_request(endpoint, seconds, nbytes, reused)
+
+
+class RecordingMetrics:
+    """Timers and counters for one recording. All add_* methods are thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.finished = None
+        self.job = {}
+        self.phases = {} # phase -> seconds
+        self.requests = {} # endpoint -> {"count", "seconds", "bytes", "reused"}
+        self.chunks = [] # {"no", "seek", "l", "bytes", "seconds", "attempts", "hls_url"}
+        self.retries = {} # hls_url -> failed chunk attempts
+        self.tuning = {} # final concurrency/chunk_seconds and the changes made on the way
+        self.http = {} # connection pool counters during the recording (shared with parallel jobs)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def add_request(self, endpoint, seconds, nbytes, reused=False):
+        with self.lock:
+            entry = self.requests.setdefault(endpoint, {"count": 0, "seconds": 0.0, "bytes": 0, "reused": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["bytes"] += nbytes
+            entry["reused"] += int(reused)
+
+    def add_chunk(self, chunk, nbytes, seconds, attempts, hls_url):
+        with self.lock:
+            self.chunks.append({"no": chunk["no"], "seek": chunk["seek"], "l": chunk["l"], "bytes": nbytes,
+                                "seconds": round(seconds, 3), "attempts": attempts, "hls_url": hls_url})
+
+    def add_retry(self, hls_url):
+        with self.lock:
+            self.retries[hls_url] = self.retries.get(hls_url, 0) + 1
+
+    def set_tuning(self, tuner):
+        with self.lock:
+            self.tuning = {"concurrency": tuner.concurrency, "chunk_seconds": tuner.chunk_seconds,
+                           "changes": list(tuner.changes)}
+
+    def set_http(self, before, after):
+        with self.lock:
+            self.http = {k: after[k] - before.get(k, 0) for k in after}
+
+    def finish(self, job):
+        self.finished = time.time()
+        self.job = job.to_dict()
+
+    def to_dict(self):
+        with self.lock:
+            total_bytes = sum(c["bytes"] for c in self.chunks)
+            download = self.phases.get("download", 0.0)
+            return {
+                "job": self.job,
+                "started": self.started,
+                "wall_seconds": round((self.finished or time.time()) - self.started, 3),
+                "phases": {k: round(v, 3) for k, v in self.phases.items()},
+                "requests": {k: dict(v, seconds=round(v["seconds"], 3)) for k, v in self.requests.items()},
+                "chunks": sorted(self.chunks, key=lambda c: c["no"]),
+                "retries": dict(self.retries),
+                "tuning": self.tuning,
+                "http": self.http,
+                "bytes": total_bytes,
+                "throughput_bps": round(total_bytes / download) if download else 0,
+            }
+
+    def write_json(self, path):
+        # One JSON record per line, appended per recording
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path):
+        # Textfile collector format; written to a temp file and renamed so it is never read half-written
+        data = self.to_dict()
+        status = data["job"].get("status", "")
+        station = data["job"].get("station_id", "")
+        lines = [
+            "# HELP radirec_last_recording_seconds Wall time of the last recording.",
+            "# TYPE radirec_last_recording_seconds gauge",
+            f'radirec_last_recording_seconds{{station="{station}",status="{status}"}} {data["wall_seconds"]}',
+            "# HELP radirec_last_recording_bytes Audio bytes downloaded by the last recording.",
+            "# TYPE radirec_last_recording_bytes gauge",
+            f"radirec_last_recording_bytes {data['bytes']}",
+            "# HELP radirec_last_throughput_bytes_per_second Download throughput of the last recording.",
+            "# TYPE radirec_last_throughput_bytes_per_second gauge",
+            f"radirec_last_throughput_bytes_per_second {data['throughput_bps']}",
+            "# HELP radirec_phase_seconds Time spent per phase of the last recording.",
+            "# TYPE radirec_phase_seconds gauge",
+        ]
+        lines += [f'radirec_phase_seconds{{phase="{k}"}} {v}' for k, v in data["phases"].items()]
+        lines += [
+            "# HELP radirec_http_request_seconds Time spent per endpoint in the last recording.",
+            "# TYPE radirec_http_request_seconds gauge",
+        ]
+        lines += [f'radirec_http_request_seconds{{endpoint="{k}"}} {v["seconds"]}' for k, v in data["requests"].items()]
+        lines += [
+            "# HELP radirec_http_requests Requests per endpoint in the last recording.",
+            "# TYPE radirec_http_requests gauge",
+        ]
+        lines += [f'radirec_http_requests{{endpoint="{k}"}} {v["count"]}' for k, v in data["requests"].items()]
+        if data["chunks"]:
+            slowest = max(c["seconds"] for c in data["chunks"])
+            lines += [
+                "# HELP radirec_chunk_seconds_max Slowest chunk download of the last recording.",
+                "# TYPE radirec_chunk_seconds_max gauge",
+                f"radirec_chunk_seconds_max {slowest}",
+            ]
+        lines += [
+            "# HELP radirec_chunk_retries Failed chunk attempts per HLS URL in the last recording.",
+            "# TYPE radirec_chunk_retries gauge",
+        ]
+        lines += [f'radirec_chunk_retries{{hls_url="{k}"}} {v}' for k, v in data["retries"].items()]
+        if data["http"]:
+            lines += [
+                "# HELP radirec_http_pool Connection pool counters during the last recording.",
+                "# TYPE radirec_http_pool gauge",
+            ]
+            lines += [f'radirec_http_pool{{counter="{k}"}} {v}' for k, v in data["http"].items()]
+        if data["tuning"]:
+            lines += [
+                "# HELP radirec_tuned_concurrency Chunks in flight at the end of the last recording.",
+                "# TYPE radirec_tuned_concurrency gauge",
+                f"radirec_tuned_concurrency {data['tuning']['concurrency']}",
+                "# HELP radirec_tuned_chunk_seconds Chunk length at the end of the last recording.",
+                "# TYPE radirec_tuned_chunk_seconds gauge",
+                f"radirec_tuned_chunk_seconds {data['tuning']['chunk_seconds']}",
+            ]
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
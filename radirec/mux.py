@@ -0,0 +1,113 @@
+"""One long-lived ffmpeg per recording that turns the in-order ADTS chunks into the final .m4a,
+and stream-copy cuts of finished recordings."""
+
+import os
+import platform
+import threading
+import subprocess
+
+
+def hidden_startupinfo():
+    # Hide the console window of ffmpeg on Windows
+    startupinfo = None
+    if platform.system() == "Windows":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+    return startupinfo
+
+
+def cut(ffmpeg_path, source, output_file, start, duration):
+    # Stream-copy `duration` seconds from `start` seconds into `source`; no re-encode
+    root, ext = os.path.splitext(output_file)
+    part_file = f"{root}.part{ext}"
+    cmd = [ffmpeg_path, "-loglevel", "error", "-ss", str(start), "-i", source, "-t", str(duration),
+           "-map", "0", "-c", "copy", "-y", part_file]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, startupinfo=hidden_startupinfo())
+    if proc.returncode != 0:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        raise Exception(f"Cut failed: {proc.stderr.decode('utf-8', errors='replace').strip()[-500:]}")
+    os.replace(part_file, output_file)
+
+
+class StreamMuxer:
+    """Feeds chunks to ffmpeg's stdin in program order; the output is written once, as it grows.
+
+    ffmpeg runs from the first write until close(). It writes to a ".part.m4a" file next to
+    the output, which is renamed when ffmpeg exits cleanly. `chunks` and `seconds` tell how
+    far the program has been fed.
+    """
+
+    def __init__(self, ffmpeg_path, output_file):
+        self.ffmpeg_path = ffmpeg_path
+        self.output_file = output_file
+        root, ext = os.path.splitext(output_file)
+        self.part_file = f"{root}.part{ext}"
+        self.proc = None
+        self.stderr = []
+        self.chunks = [] # chunks fed so far, in order
+        self.seconds = 0
+        self.bytes = 0
+
+    def start(self):
+        cmd = [
+            self.ffmpeg_path,
+            "-loglevel", "error",
+            "-f", "aac",
+            "-i", "pipe:0",
+            "-acodec", "copy",
+            "-vn",
+            "-bsf:a", "aac_adtstoasc",
+            "-y",
+            self.part_file
+        ]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.PIPE, startupinfo=hidden_startupinfo())
+        except OSError as e:
+            raise Exception(f"Remux failed: {e}")
+        # Drain stderr so ffmpeg never blocks on a full pipe
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stderr(self):
+        for line in self.proc.stderr:
+            self.stderr.append(line.decode("utf-8", errors="replace").rstrip())
+
+    def write(self, chunk, data):
+        if self.proc is None:
+            self.start()
+        try:
+            self.proc.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            self.proc.wait()
+            raise Exception(f"Remux failed: {self._errors()}")
+        self.chunks.append(chunk)
+        self.seconds += chunk["l"]
+        self.bytes += len(data)
+
+    def close(self):
+        # Finish the file: ffmpeg writes the moov atom once stdin is closed
+        if self.proc is None:
+            raise Exception("Remux failed: no audio")
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise Exception(f"Remux failed: {self._errors()}")
+        os.replace(self.part_file, self.output_file)
+
+    def abort(self):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+        try:
+            os.remove(self.part_file)
+        except OSError:
+            pass
+
+    def _errors(self):
+        return " ".join(line for line in self.stderr if line)[-500:]
@@ -0,0 +1,312 @@
+"""HTTP client: a keep-alive connection pool with timeouts, retries and gzip, shared by all requests.
+
+http.client, gzip and zlib are imported on first use to keep `import radirec` cheap.
+"""
+
+import time
+import random
+import threading
+import urllib.parse
+import urllib.error
+
+from .config import (HLS_POOL_SIZE, HLS_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF,
+                     HTTP_BACKOFF_MAX)
+from .metrics import record_request
+
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+# Worth another try after a backoff; other 4xx are final
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    # Pool behind http_request/http_open for callers that were not given one
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+def http_request(url, headers=None, data=None, method='GET', endpoint=None):
+    return default_pool().request(url, headers, data, method, endpoint)
+
+
+def http_open(url, headers=None):
+    # Open a GET request for streaming; the caller reads (and closes) the response
+    return default_pool().open(url, headers)
+
+
+class TeeReader:
+    """File-like wrapper that copies everything read from `src` into `dst`."""
+
+    def __init__(self, src, dst):
+        self.src = src
+        self.dst = dst
+
+    def read(self, size=-1):
+        data = self.src.read(size)
+        self.dst.write(data)
+        return data
+
+
+class PooledResponse:
+    """Response on a pooled connection, read as a stream; gzip bodies are decoded on the fly.
+
+    close() hands the connection back to the pool if the body was read to the end.
+    """
+
+    def __init__(self, pool, key, conn, res, slot, reused):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.res = res
+        self.slot = slot
+        self.reused = reused
+        self.status = res.status
+        self.reason = res.reason
+        self.headers = res.headers
+        self.decoder = None
+        if (res.getheader("Content-Encoding") or "").lower() == "gzip":
+            import zlib
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.res.read()
+            return self.decoder.decompress(data) + self.decoder.flush() if self.decoder else data
+        if self.decoder is None:
+            return self.res.read(size)
+        while True:
+            raw = self.res.read(size)
+            if not raw:
+                return self.decoder.flush()
+            data = self.decoder.decompress(raw)
+            if data:
+                return data
+
+    def close(self):
+        if self.res is None:
+            return
+        res, self.res = self.res, None
+        try:
+            self.pool._finish(self.key, self.conn, res)
+        finally:
+            self.slot.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) client shared by API calls, chunk workers (and batch jobs), pooled per host.
+
+    At most `max_per_host` requests are in flight to one host at a time. Connecting and reading
+    have separate timeouts; for API calls (request/open), connection errors, timeouts and 429/5xx
+    responses are retried up to `retries` times with jittered exponential backoff. HLS GETs (get)
+    are tried once. `stats` counts requests, new and reused connections and retries.
+
+    Proxies are those urllib uses (http_proxy/https_proxy/no_proxy, or the system settings on
+    Windows and macOS) unless `proxies` ({scheme: proxy URL}) is given: https goes through a
+    CONNECT tunnel, http is sent to the proxy with the full URL.
+    """
+
+    def __init__(self, max_per_host=HLS_POOL_SIZE, timeout=HLS_TIMEOUT, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, proxies=None):
+        import urllib.request
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.idle = {} # (scheme, netloc) -> [connection, ...]
+        self.slots = {} # (scheme, netloc) -> semaphore
+        self.stats = {"requests": 0, "connections": 0, "reused": 0, "retries": 0}
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self.routes = {} # (scheme, netloc) -> (proxy netloc, Proxy-Authorization or None), or None
+
+    def _count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def _slot(self, key):
+        with self.lock:
+            if key not in self.slots:
+                self.slots[key] = threading.BoundedSemaphore(self.max_per_host)
+            return self.slots[key]
+
+    def _route(self, key):
+        # The proxy `key` is reached through, or None for a direct connection
+        with self.lock:
+            if key in self.routes:
+                return self.routes[key]
+        import urllib.request
+        scheme, netloc = key
+        proxy = self.proxies.get(scheme)
+        route = None
+        if proxy and not urllib.request.proxy_bypass(urllib.parse.urlsplit(f"//{netloc}").hostname):
+            if "://" not in proxy:
+                proxy = "http://" + proxy
+            parts = urllib.parse.urlsplit(proxy)
+            auth = None
+            if parts.username:
+                import base64
+                credentials = f"{urllib.parse.unquote(parts.username)}:{urllib.parse.unquote(parts.password or '')}"
+                auth = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+            route = (parts.netloc.rpartition("@")[2], auth)
+        with self.lock:
+            self.routes[key] = route
+        return route
+
+    def _acquire(self, key):
+        import http.client
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns:
+                return conns.pop(), True
+        scheme, netloc = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        route = self._route(key)
+        if route is None:
+            conn = cls(netloc, timeout=self.connect_timeout)
+        else:
+            proxy, auth = route
+            conn = cls(proxy, timeout=self.connect_timeout)
+            if scheme == "https":
+                conn.set_tunnel(netloc, headers={"Proxy-Authorization": auth} if auth else None)
+        conn.connect()
+        conn.sock.settimeout(self.timeout)
+        self._count("connections")
+        return conn, False
+
+    def _release(self, key, conn):
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if len(conns) < self.max_per_host:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def _finish(self, key, conn, res):
+        # Reuse the connection only if the response was read to the end
+        if res.will_close or not res.isclosed():
+            conn.close()
+        else:
+            self._release(key, conn)
+
+    def _send(self, key, method, path, headers, body):
+        import http.client
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                res = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection, retry on another one
+                continue
+            self._count("requests")
+            if reused:
+                self._count("reused")
+            return conn, res, reused
+
+    def _open(self, url, method="GET", headers=None, data=None, redirects=5):
+        # One attempt: send the request, follow redirects and return the response unread.
+        # Any status >= 300 that is not followed is raised as HTTPError, like urllib does
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip")
+        while True:
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            send_headers = headers
+            route = self._route(key)
+            if route is not None and parts.scheme == "http":
+                # A plain HTTP proxy is sent the whole URL
+                path = urllib.parse.urlunsplit(parts._replace(fragment=""))
+                if route[1]:
+                    send_headers = dict(headers, **{"Proxy-Authorization": route[1]})
+            slot = self._slot(key)
+            slot.acquire()
+            try:
+                conn, res, reused = self._send(key, method, path, send_headers, data)
+            except BaseException:
+                slot.release()
+                raise
+            response = PooledResponse(self, key, conn, res, slot, reused)
+            if res.status < 300:
+                return response
+            # Drain the body so the connection can be reused
+            with response:
+                response.read()
+            if res.status in REDIRECT_STATUS and redirects > 0:
+                url = urllib.parse.urljoin(url, res.getheader("Location", ""))
+                redirects -= 1
+                if res.status == 303:
+                    method, data = "GET", None
+                continue
+            raise urllib.error.HTTPError(url, res.status, res.reason, res.headers, None)
+
+    def _retrying(self, attempt):
+        import http.client
+        tries = 0
+        while True:
+            try:
+                return attempt()
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUS or tries >= self.retries:
+                    raise
+            except (http.client.HTTPException, OSError):
+                if tries >= self.retries:
+                    raise
+            tries += 1
+            self._count("retries")
+            # Exponential backoff with +-50% jitter, so parallel workers do not retry in lockstep
+            delay = min(HTTP_BACKOFF_MAX, self.backoff * 2 ** (tries - 1))
+            time.sleep(delay * random.uniform(0.5, 1.5))
+
+    def request(self, url, headers=None, data=None, method='GET', endpoint=None):
+        # Whole response body and headers
+        if data is not None and isinstance(data, dict):
+            data = urllib.parse.urlencode(data).encode('utf-8')
+        started = time.perf_counter()
+
+        def attempt():
+            with self._open(url, method, headers, data) as res:
+                return res.read(), res.headers, res.reused
+
+        content, res_headers, reused = self._retrying(attempt)
+        record_request(endpoint or urllib.parse.urlsplit(url).path, time.perf_counter() - started,
+                       len(content), reused)
+        return content, res_headers
+
+    def open(self, url, headers=None):
+        # Streaming GET; only opening the response is retried
+        return self._retrying(lambda: self._open(url, "GET", headers))
+
+    def get(self, url, headers=None):
+        # Body of a GET, for HLS playlists and segments (not recorded per endpoint). A single
+        # attempt: the recorder fails the chunk over to another endpoint and the tuner backs off
+        with self._open(url, "GET", headers) as res:
+            return res.read()
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle = {}
@@ -0,0 +1,153 @@
+"""Optional post-processing of finished recordings (tags, loudness, MP3) in a bounded process pool.
+
+Steps run in worker processes, one recording at a time per worker, so they never hold up the
+download of the next program. Each step is an ffmpeg run:
+    tag      - title/station/date tags, stream copy (no re-encode)
+    loudnorm - EBU R128 loudness normalization (re-encodes the AAC)
+    mp3      - an extra .mp3 copy next to the .m4a
+"""
+
+import os
+import time
+import threading
+import subprocess
+
+from .config import POSTPROCESS_WORKERS, LOUDNORM_FILTER, LOUDNORM_BITRATE, MP3_QUALITY
+from .mux import hidden_startupinfo
+
+STEPS = ("tag", "loudnorm", "mp3")
+
+
+def run_ffmpeg(ffmpeg_path, args):
+    proc = subprocess.run([ffmpeg_path, "-loglevel", "error", "-y"] + args, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, startupinfo=hidden_startupinfo())
+    if proc.returncode != 0:
+        raise Exception(proc.stderr.decode("utf-8", errors="replace").strip()[-500:] or f"ffmpeg exit {proc.returncode}")
+
+
+def replace_with(ffmpeg_path, path, args):
+    # Write next to the file and swap it in, so a failed step leaves the recording untouched
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.post{ext}"
+    try:
+        run_ffmpeg(ffmpeg_path, ["-i", path] + args + [tmp])
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def step_tag(ffmpeg_path, path, meta):
+    args = ["-map", "0", "-c", "copy"]
+    for key in ("title", "artist", "album", "date", "comment"):
+        if meta.get(key):
+            args += ["-metadata", f"{key}={meta[key]}"]
+    replace_with(ffmpeg_path, path, args)
+    return path
+
+
+def step_loudnorm(ffmpeg_path, path, meta):
+    replace_with(ffmpeg_path, path, ["-map_metadata", "0", "-af", LOUDNORM_FILTER, "-ar", "48000",
+                                     "-c:a", "aac", "-b:a", LOUDNORM_BITRATE])
+    return path
+
+
+def step_mp3(ffmpeg_path, path, meta):
+    mp3_path = os.path.splitext(path)[0] + ".mp3"
+    run_ffmpeg(ffmpeg_path, ["-i", path, "-vn", "-map_metadata", "0", "-c:a", "libmp3lame",
+                             "-q:a", str(MP3_QUALITY), "-id3v2_version", "3", mp3_path])
+    return mp3_path
+
+
+def run_steps(ffmpeg_path, path, meta, steps):
+    # Runs in a worker process. Stops at the first failing step
+    handlers = {"tag": step_tag, "loudnorm": step_loudnorm, "mp3": step_mp3}
+    result = {"path": path, "outputs": [], "timings": {}, "error": None}
+    for step in steps:
+        started = time.perf_counter()
+        try:
+            output = handlers[step](ffmpeg_path, path, meta)
+        except Exception as e:
+            result["error"] = f"{step}: {e}"
+            break
+        finally:
+            result["timings"][step] = round(time.perf_counter() - started, 2)
+        if output not in result["outputs"]:
+            result["outputs"].append(output)
+    return result
+
+
+class PostProcessor:
+    """Queues finished jobs for `steps` on a pool of `workers` processes.
+
+    submit() returns at once. Results are logged and stored in job.post; `on_status(depth, result)`
+    is called whenever the queue depth changes, with the last finished result (or None).
+    """
+
+    def __init__(self, ffmpeg_path, steps, catalog=None, workers=POSTPROCESS_WORKERS, log=print, on_status=None):
+        unknown = [step for step in steps if step not in STEPS]
+        if unknown:
+            raise ValueError(f"Unknown post-processing step: {', '.join(unknown)}")
+        self.ffmpeg_path = ffmpeg_path
+        self.steps = list(steps)
+        self.catalog = catalog
+        self.workers = workers
+        self.log = log
+        self.on_status = on_status
+        self.lock = threading.Lock()
+        self.executor = None
+        self.depth = 0 # queued or running
+
+    def meta(self, job):
+        station = self.catalog.get(job.station_id) if self.catalog else None
+        return {
+            "title": job.title,
+            "artist": station["name"] if station else job.station_id,
+            "album": job.title,
+            "date": job.from_time[:8],
+            "comment": f"radiko {job.station_id} {job.from_time}-{job.to_time}",
+        }
+
+    def submit(self, job):
+        if job.parts:
+            # A station day: every program file is processed on its own
+            return [self.submit(part) for part in job.parts]
+        if not self.steps or job.status != "done" or not job.output or job.skipped:
+            return None
+        with self.lock:
+            if self.executor is None:
+                # Worker processes are only started once something is queued
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.depth += 1
+            depth = self.depth
+            future = self.executor.submit(run_steps, self.ffmpeg_path, job.output, self.meta(job), self.steps)
+        self.log(f"後処理を予約: {os.path.basename(job.output)} (待ち {depth}件)")
+        if self.on_status:
+            self.on_status(depth, None)
+        future.add_done_callback(lambda f: self._done(job, f))
+        return future
+
+    def _done(self, job, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"path": job.output, "outputs": [], "timings": {}, "error": str(e)}
+        job.post = result
+        with self.lock:
+            self.depth -= 1
+            depth = self.depth
+        timings = ", ".join(f"{step} {seconds:.1f}s" for step, seconds in result["timings"].items())
+        if result["error"]:
+            self.log(f"後処理エラー: {os.path.basename(job.output)} ({result['error']})")
+        else:
+            self.log(f"後処理完了: {os.path.basename(job.output)} ({timings})")
+        if self.on_status:
+            self.on_status(depth, result)
+
+    def shutdown(self, wait=True, cancel=False):
+        # cancel=True drops what has not started yet
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel)
@@ -0,0 +1,662 @@
+"""UI-free recording core: a job description and the recorder that runs it."""
+
+import os
+import re
+import time
+import shutil
+import datetime
+import platform
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .config import (DEFAULT_TEMPLATE, DEFAULT_CONCURRENCY, MAX_CONCURRENCY, CHUNK_SECONDS, MIN_CHUNK_SECONDS,
+                     MAX_CHUNK_SECONDS, CHUNK_RETRIES, CHUNK_DURATION_TOLERANCE, METRICS_FILE, RADIKO_URL,
+                     SPOOL, SPOOL_AHEAD, SPLIT_WORKERS)
+from .hls import HlsDownloader, EndpointRanking, adts_duration
+from .journal import open_journal
+from .mux import StreamMuxer, cut
+from .metrics import RecordingMetrics, observe
+from .tuning import ChunkTuner
+from .catalog import StationStreams
+
+
+def find_ffmpeg(configured=None):
+    if configured:
+        return configured
+    ffmpeg_path = "ffmpeg"
+    # 1. Check local directory (mostly for Windows portable)
+    local_bin = "ffmpeg.exe" if platform.system() == "Windows" else "ffmpeg"
+    if os.path.exists(os.path.join(os.getcwd(), local_bin)):
+        ffmpeg_path = os.path.abspath(local_bin)
+    else:
+        # 2. Check system PATH
+        path_bin = shutil.which("ffmpeg")
+        if path_bin:
+            ffmpeg_path = path_bin
+    return ffmpeg_path
+
+
+def unique_path(path):
+    # `path`, or "<name> (2).m4a", "<name> (3).m4a"... if it is taken
+    root, ext = os.path.splitext(path)
+    n = 2
+    while os.path.exists(path):
+        path = f"{root} ({n}){ext}"
+        n += 1
+    return path
+
+
+class RecordingJob:
+    """One program to record: a radiko URL, or a station with start time and duration (or end).
+
+    With `day`, the whole broadcast day (05:00-29:00) of the station on from_time's date is
+    recorded and split into one file per program; those are in `parts`.
+    """
+
+    def __init__(self, station_id="", from_time="", duration_min=None, url="", day=False, to_time=""):
+        self.station_id = station_id
+        self.from_time = from_time
+        self.to_time = to_time
+        self.duration_min = duration_min
+        self.url = url
+        self.day = day
+        self.title = None
+        self.status = "pending" # pending / running / done / failed
+        self.output = None
+        self.error = None
+        self.elapsed = 0.0
+        self.post = None # post-processing result, see PostProcessor
+        self.skipped = False # already in the library, nothing was recorded
+        self.parts = [] # per-program jobs of a station day
+
+    @property
+    def label(self):
+        if self.day:
+            return f"{self.station_id} {self.from_time[:8]} 1日"
+        if self.station_id and self.from_time:
+            return f"{self.station_id} {self.from_time[:12]}"
+        return self.url or "?"
+
+    def to_dict(self):
+        return {
+            "station_id": self.station_id,
+            "from_time": self.from_time,
+            "to_time": self.to_time,
+            "url": self.url,
+            "title": self.title,
+            "status": self.status,
+            "output": self.output,
+            "error": self.error,
+            "elapsed": round(self.elapsed, 1),
+            "post": self.post,
+            "skipped": self.skipped,
+            "parts": [part.to_dict() for part in self.parts],
+        }
+
+
+def parse_program_url(url):
+    # (station_id, from_time) of a radiko time-free URL, or None
+    if "#!/ts/" in url:
+        parts = url.split("#!/ts/")[1].split("/")
+        if len(parts) >= 2:
+            return parts[0], parts[1]
+    elif "sid=" in url and "t=" in url:
+        qs = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        if qs.get('sid') and qs.get('t'):
+            return qs['sid'][0], qs['t'][0]
+    return None
+
+
+def parse_job_line(line):
+    # "<radiko URL>", "<station> <YYYYMMDDHHMM> <minutes>" or "<station> <YYYYMMDD>" for the
+    # whole day (comma or whitespace separated)
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("http"):
+        return RecordingJob(url=line)
+    fields = [f for f in re.split(r"[,\s]+", line) if f]
+    if len(fields) == 2 and len(fields[1]) == 8 and fields[1].isdigit():
+        return RecordingJob(station_id=fields[0], from_time=fields[1], day=True)
+    if len(fields) != 3 or not fields[1].isdigit() or not fields[2].isdigit():
+        raise ValueError(f"Invalid job: {line}")
+    return RecordingJob(station_id=fields[0], from_time=fields[1], duration_min=int(fields[2]))
+
+
+class Recorder:
+    """Records one job without any UI. Auth, catalog, guide and the connection pool are shared.
+
+    Messages go to `log`, download progress (in seconds of audio) to `on_progress`; record()
+    returns the job with its status, output and error filled in. Timings of the last recording
+    are in `metrics`. `concurrency` and `chunk_seconds` are starting values that ChunkTuner
+    adjusts within the given limits unless `auto_tune` is off. `streams` (StationStreams) caches
+    the stream XML; pass a shared one so recordings and the warm-up fetch it once. `spool` chooses where chunks wait
+    for the muxer ("memory", "tmpfs" or "disk"). With a `library`, programs already recorded are
+    skipped (or cut from a longer recording) and every new recording is added to it.
+    """
+
+    def __init__(self, auth, catalog, guide, pool, log, template=DEFAULT_TEMPLATE,
+                 concurrency=DEFAULT_CONCURRENCY, out_dir=None, on_progress=None,
+                 metrics_file=METRICS_FILE, prometheus_file=None, chunk_seconds=CHUNK_SECONDS,
+                 ffmpeg_path=None, base_url=RADIKO_URL, auto_tune=True, max_concurrency=MAX_CONCURRENCY,
+                 min_chunk_seconds=MIN_CHUNK_SECONDS, max_chunk_seconds=MAX_CHUNK_SECONDS, spool=SPOOL,
+                 spool_dir=None, library=None, streams=None):
+        self.auth = auth
+        self.catalog = catalog
+        self.guide = guide
+        self.pool = pool
+        self.log = log
+        self.template = template
+        self.concurrency = concurrency
+        self.out_dir = out_dir or os.getcwd()
+        self.on_progress = on_progress # on_progress(job, done_seconds, total_seconds)
+        self.metrics_file = metrics_file
+        self.prometheus_file = prometheus_file
+        self.chunk_seconds = chunk_seconds
+        self.ffmpeg_path = ffmpeg_path
+        self.base_url = base_url
+        self.auto_tune = auto_tune
+        self.max_concurrency = max_concurrency
+        self.min_chunk_seconds = min_chunk_seconds
+        self.max_chunk_seconds = max_chunk_seconds
+        self.spool = spool
+        self.spool_dir = spool_dir
+        self.library = library
+        self.streams = streams or StationStreams(pool.request, base_url=base_url)
+        self.metrics = RecordingMetrics()
+
+    def resolve(self, job):
+        # Fill station_id/from_time/to_time from the URL or the duration
+        if job.day:
+            # radiko's broadcast day: 05:00 to 29:00 (05:00 the next morning)
+            dt_day = datetime.datetime.strptime(job.from_time[:8], "%Y%m%d")
+            job.from_time = job.from_time[:8] + "050000"
+            job.to_time = (dt_day + datetime.timedelta(days=1)).strftime("%Y%m%d") + "050000"
+            self.log(f"1日分: {job.station_id}, {job.from_time} - {job.to_time}")
+        elif job.url:
+            parsed = parse_program_url(job.url)
+            if parsed:
+                job.station_id, job.from_time = parsed
+            
+            if len(job.from_time) == 12: job.from_time += "00"
+            self.log(f"URL解析: {job.station_id}, {job.from_time}")
+            dt_start = datetime.datetime.strptime(job.from_time, "%Y%m%d%H%M%S")
+            # Record exactly the program's ft..to range, 1 hour if it is not in the guide
+            try:
+                prog = self.guide.find(job.station_id, job.from_time)
+            except Exception as e:
+                self.log(f"番組表取得エラー: {e}")
+                prog = None
+            if prog:
+                job.from_time, job.to_time = prog["ft"], prog["to"]
+                self.log(f"番組時間: {job.from_time} - {job.to_time}")
+            else:
+                job.to_time = (dt_start + datetime.timedelta(hours=1)).strftime("%Y%m%d%H%M%S")
+        else:
+            if len(job.from_time) == 12: job.from_time += "00"
+            dt_start = datetime.datetime.strptime(job.from_time, "%Y%m%d%H%M%S")
+            if not job.to_time:
+                # A job from the program search already has the exact end
+                dt_end = dt_start + datetime.timedelta(minutes=job.duration_min or 0)
+                job.to_time = dt_end.strftime("%Y%m%d%H%M%S")
+
+    def get_program_title(self, station_id, from_time):
+        try:
+            prog = self.guide.find(station_id, from_time)
+            if prog and prog["title"]:
+                return prog["title"]
+        except Exception as e:
+            self.log(f"番組名取得エラー: {e}")
+        return "Unknown_Title"
+
+    def output_path(self, station_id, from_time, title):
+        filename = self.template.replace("{DATE}", from_time[:8])\
+                                .replace("{TIME}", from_time[8:12])\
+                                .replace("{TITLE}", re.sub(r'[\\/:*?"<>|]', '_', title))\
+                                .replace("{STATION}", station_id)
+        return os.path.join(self.out_dir, station_id, f"{filename}.m4a")
+
+    def reuse_recorded(self, job, output_file):
+        # True if the library already has job's range: the same program is skipped, a longer
+        # recording that contains it is cut with stream copy
+        try:
+            entry = self.library.covering(job.station_id, job.from_time, job.to_time)
+        except Exception as e:
+            self.log(f"ライブラリ参照エラー: {e}")
+            return False
+        if entry is None:
+            return False
+        if entry["ft"] == job.from_time and entry["to_time"] == job.to_time:
+            self.log(f"録音済みのためスキップ: {entry['path']}")
+            job.output = entry["path"]
+            job.skipped = True
+            return True
+        if os.path.exists(output_file):
+            # Usually the longer recording itself (a program with the same start time gets the
+            # same name): cutting over it would lose it, so the cut goes next to it
+            output_file = unique_path(output_file)
+        dt_entry = datetime.datetime.strptime(entry["ft"], "%Y%m%d%H%M%S")
+        start = (datetime.datetime.strptime(job.from_time, "%Y%m%d%H%M%S") - dt_entry).total_seconds()
+        duration = (datetime.datetime.strptime(job.to_time, "%Y%m%d%H%M%S") - dt_entry).total_seconds() - start
+        self.log(f"録音済みのファイルから切り出し: {os.path.basename(entry['path'])}")
+        try:
+            with self.metrics.phase("remux"):
+                cut(find_ffmpeg(self.ffmpeg_path), entry["path"], output_file, int(start), int(duration))
+        except Exception as e:
+            self.log(f"切り出しに失敗したため録音します: {e}")
+            return False
+        job.output = output_file
+        self.add_to_library(job)
+        return True
+
+    def add_to_library(self, job):
+        try:
+            self.library.add_job(job)
+        except Exception as e:
+            self.log(f"ライブラリ登録エラー: {e}")
+
+    def next_chunk(self, no, dt_from, offset, total_duration, length, journal):
+        # The chunk starting `offset` seconds into the program. A chunk already in the journal
+        # keeps its length; otherwise `length`, with the last chunk rounded up to 5 seconds,
+        # cut short where the next journaled chunk starts so that one can be reused too
+        seek_ts = dt_from + datetime.timedelta(seconds=offset)
+        seek = seek_ts.strftime("%Y%m%d%H%M%S")
+        left_sec = total_duration - offset
+        l = journal.length_at(seek)
+        if l is None:
+            l = min(length, left_sec)
+            if l == left_sec and l % 5 != 0:
+                l = ((l // 5) + 1) * 5
+            next_seek = journal.next_seek(seek)
+            if next_seek is not None:
+                gap = datetime.datetime.strptime(next_seek, "%Y%m%d%H%M%S") - seek_ts
+                l = min(l, int(gap.total_seconds()))
+        return {
+            "no": no,
+            "seek": seek,
+            "end": (seek_ts + datetime.timedelta(seconds=l)).strftime("%Y%m%d%H%M%S"),
+            "l": l,
+        }
+
+    def make_tuner(self):
+        return ChunkTuner(self.concurrency, self.chunk_seconds, max_concurrency=self.max_concurrency,
+                          min_chunk_seconds=self.min_chunk_seconds, max_chunk_seconds=self.max_chunk_seconds,
+                          adaptive=self.auto_tune, log=self.log)
+
+    def stream_url(self, hls_url, station_id, from_time, lsid, chunk):
+        return (f"{hls_url}?station_id={station_id}&start_at={from_time}&ft={from_time}"
+                f"&seek={chunk['seek']}&end_at={chunk['end']}&to={chunk['end']}&l={chunk['l']}&lsid={lsid}&type=c")
+
+    def probe_endpoints(self, endpoints, downloader, station_id, from_time, lsid, chunk):
+        stream_urls = {url: self.stream_url(url, station_id, from_time, lsid, chunk) for url in endpoints.order}
+        for url, latency, error in endpoints.probe(downloader, stream_urls):
+            if error is None:
+                self.log(f"エンドポイント確認: {url} ({latency * 1000:.0f}ms)")
+            else:
+                self.log(f"エンドポイント確認: {url} 失敗 ({error})")
+        self.log(f"使用URL: {endpoints.pick()}")
+
+    def backoff(self, endpoints, tried, attempt):
+        # Failing over to an untried endpoint is immediate; wait only once all were tried
+        if set(tried) >= set(endpoints.order):
+            time.sleep(attempt)
+
+    def download_chunk(self, downloader, endpoints, station_id, from_time, lsid, chunk, journal, tuner):
+        # Each attempt goes to the best endpoint this chunk has not failed on yet
+        tried = []
+        attempts = max(CHUNK_RETRIES, len(endpoints.order))
+        for attempt in range(1, attempts + 1):
+            hls_url = endpoints.pick(tried)
+            if tried and hls_url != tried[-1]:
+                self.log(f"チャンク{chunk['no']} 切り替え: {hls_url}")
+            tried.append(hls_url)
+            started = time.perf_counter()
+            # The token this attempt is sent with; another worker may replace downloader.headers
+            token = downloader.headers["X-Radiko-AuthToken"]
+            try:
+                data = downloader.fetch(self.stream_url(hls_url, station_id, from_time, lsid, chunk))
+                duration = adts_duration(data)
+                if duration < chunk["l"] - CHUNK_DURATION_TOLERANCE:
+                    raise Exception(f"Chunk too short ({duration:.1f}s / {chunk['l']}s)")
+            except urllib.error.HTTPError as e:
+                self.metrics.add_retry(hls_url)
+                self.log(f"チャンク{chunk['no']} エラー発生 ({attempt}/{attempts}): {e}")
+                if e.code in (401, 403):
+                    # Token expired or was revoked: re-authenticate once for all workers.
+                    # Not a sign of load or of a bad endpoint, so neither is told
+                    if self.auth.refresh(token):
+                        downloader.headers = self.auth.hls_headers()
+                        tried.pop()
+                        continue
+                endpoints.report(hls_url, False)
+                tuner.on_error(started)
+                self.backoff(endpoints, tried, attempt)
+            except Exception as e:
+                self.metrics.add_retry(hls_url)
+                self.log(f"チャンク{chunk['no']} エラー発生 ({attempt}/{attempts}): {e}")
+                endpoints.report(hls_url, False)
+                tuner.on_error(started)
+                self.backoff(endpoints, tried, attempt)
+            else:
+                # Outside the try: a full or broken spool is neither the endpoint's fault nor
+                # fixed by another attempt, so the recording stops
+                try:
+                    journal.record(chunk, data, duration)
+                except OSError as e:
+                    raise Exception(f"Spool write failed (chunk {chunk['no']}): {e}") from e
+                endpoints.report(hls_url, True)
+                self.metrics.add_chunk(chunk, len(data), time.perf_counter() - started, attempt, hls_url)
+                tuner.on_success(len(data))
+                return
+        raise Exception(f"Download failed (chunk {chunk['no']})")
+
+    def download_chunks(self, job, downloader, endpoints, station_id, from_time, lsid, dt_from, total_duration,
+                        journal, tuner, muxer):
+        # Cut the program into chunks as the download goes, so each new chunk gets the tuner's
+        # current length, and keep up to tuner.concurrency of them in flight. Chunks go to the
+        # muxer in program order as soon as every earlier one is there; the download starts
+        # where the muxer is
+        pending = [] # cut but not yet muxed, in order
+        ready = set() # seeks of pending chunks that are in the journal
+        offset = done = muxer.seconds # seconds of audio
+        reused = 0
+        in_flight = {} # future -> chunk
+        with ThreadPoolExecutor(max_workers=tuner.max_concurrency) as pool:
+            try:
+                while offset < total_duration or pending:
+                    while (offset < total_duration and len(in_flight) < tuner.concurrency
+                           and len(pending) - len(in_flight) < SPOOL_AHEAD):
+                        chunk = self.next_chunk(len(muxer.chunks) + len(pending), dt_from, offset, total_duration,
+                                                tuner.chunk_seconds, journal)
+                        pending.append(chunk)
+                        offset += chunk["l"]
+                        if journal.is_done(chunk):
+                            ready.add(chunk["seek"])
+                            done += chunk["l"]
+                            reused += 1
+                            continue
+                        in_flight[pool.submit(self.download_chunk, downloader, endpoints, station_id, from_time,
+                                              lsid, chunk, journal, tuner)] = chunk
+                    while pending and pending[0]["seek"] in ready:
+                        chunk = pending.pop(0)
+                        ready.discard(chunk["seek"])
+                        muxer.write(chunk, journal.read(chunk))
+                    if not in_flight:
+                        continue
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        chunk = in_flight.pop(future)
+                        future.result()
+                        ready.add(chunk["seek"])
+                        done = min(total_duration, done + chunk["l"])
+                        self.log(f"ダウンロード中... ({done // 60}/{total_duration // 60}分, "
+                                 f"{int(done/total_duration*100)}%)")
+                        if self.on_progress:
+                            self.on_progress(job, done, total_duration)
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                raise
+        if reused:
+            self.log(f"取得済みチャンクを再利用: {reused}/{len(muxer.chunks)}")
+
+    def record(self, job, mail, password):
+        job.status = "running"
+        started = time.time()
+        self.metrics = RecordingMetrics()
+        http_before = self.pool.snapshot()
+        try:
+            with observe(self.metrics):
+                success = self._record(job, mail, password)
+        except Exception as e:
+            self.log(f"エラー: {e}")
+            job.error = str(e)
+            success = False
+        job.elapsed = time.time() - started
+        job.status = "done" if success else "failed"
+        self.metrics.set_http(http_before, self.pool.snapshot())
+        self.metrics.finish(job)
+        self.write_metrics()
+        return job
+
+    def write_metrics(self):
+        try:
+            if self.metrics_file:
+                self.metrics.write_json(self.metrics_file)
+            if self.prometheus_file:
+                self.metrics.write_prometheus(self.prometheus_file)
+        except Exception as e:
+            self.log(f"メトリクス書き込みエラー: {e}")
+
+    def _record(self, job, mail, password):
+        import secrets
+        import xml.etree.ElementTree as ET
+        with self.metrics.phase("auth"):
+            authorized = self.auth.ensure(mail, password)
+        if not authorized:
+            self.log("認証に失敗しました。終了します。")
+            job.error = "auth failed"
+            return False
+
+        try:
+            with self.metrics.phase("guide"):
+                self.resolve(job)
+        except Exception:
+            self.log("URL解析エラー")
+            job.error = "invalid job"
+            return False
+        station_id, from_time, to_time = job.station_id, job.from_time, job.to_time
+
+        # Fetch Title for naming
+        if job.day:
+            title = f"{station_id} {from_time[:8]} 1日分"
+        else:
+            self.log("詳細情報を取得中...")
+            with self.metrics.phase("guide"):
+                title = self.get_program_title(station_id, from_time)
+        job.title = title
+        
+        # Folder & Filename construction
+        station_dir = os.path.join(self.out_dir, station_id)
+        if not os.path.exists(station_dir):
+            os.makedirs(station_dir, exist_ok=True)
+            self.log(f"フォルダ作成: {station_id}")
+            
+        if job.day:
+            # Only kept until it is split into programs
+            output_file = os.path.join(station_dir, f"{from_time[:8]}_{station_id}_day.m4a")
+        else:
+            output_file = self.output_path(station_id, from_time, title)
+        if self.library and job.day and self.day_recorded(job, station_dir):
+            return True
+        if self.library and not job.day and self.reuse_recorded(job, output_file):
+            self.log(f"録音成功: {os.path.basename(job.output)}")
+            return True
+
+        # Recording logic
+        # 1. Get Station Area ID
+        with self.metrics.phase("catalog"):
+            station_area_id = self.catalog.area_of(station_id)
+
+        # 2. Get HLS URL
+        with self.metrics.phase("stream_xml"):
+            content = self.streams.get(station_id)
+        root = ET.fromstring(content)
+        
+        is_premium = self.auth.radiko_session is not None
+        target_areafree = "1" if is_premium and self.auth.area_id != station_area_id else "0"
+        
+        hls_urls = []
+        for url_node in root.findall(".//url"):
+            if url_node.get("timefree") == "1" and url_node.get("areafree") == target_areafree:
+                hls_urls.append(url_node.find("playlist_create_url").text)
+        
+        if not hls_urls:
+            fallback = root.find(".//url[@timefree='1']/playlist_create_url")
+            if fallback is not None: hls_urls = [fallback.text]
+        if not hls_urls:
+            self.log("タイムフリーのストリームURLが見つかりません。")
+            job.error = "no stream url"
+            return False
+
+        self.log(f"録音開始: {title} ({station_id})")
+        
+        ffmpeg_path = find_ffmpeg(self.ffmpeg_path)
+        self.log(f"FFmpeg path: {ffmpeg_path}")
+
+        lsid = secrets.token_hex(16)
+        
+        dt_from = datetime.datetime.strptime(from_time, "%Y%m%d%H%M%S")
+        dt_to = datetime.datetime.strptime(to_time, "%Y%m%d%H%M%S")
+        total_duration = int((dt_to - dt_from).total_seconds())
+        
+        
+        # Chunk processing
+        journal = open_journal(self.spool, station_id, from_time, to_time, self.spool_dir, total_duration, self.log)
+        muxer = StreamMuxer(ffmpeg_path, output_file)
+        
+        downloader = HlsDownloader(self.pool, self.auth.hls_headers())
+        tuner = self.make_tuner()
+        if self.auto_tune:
+            self.log(f"自動調整: 同時数 {tuner.concurrency} (上限 {tuner.max_concurrency}), "
+                     f"チャンク {tuner.chunk_seconds}秒 ({tuner.min_chunk_seconds}〜{tuner.max_chunk_seconds}秒)")
+        
+        # Probe every candidate endpoint at once with the first chunk's playlist, then let each
+        # chunk fail over on its own; chunks already downloaded are kept whichever endpoint they came from
+        endpoints = EndpointRanking(hls_urls)
+        first_chunk = self.next_chunk(0, dt_from, 0, total_duration, tuner.chunk_seconds, journal)
+        with self.metrics.phase("probe"):
+            self.probe_endpoints(endpoints, downloader, station_id, from_time, lsid, first_chunk)
+
+        success = False
+        try:
+            # Chunks already in the journal are kept, only the missing ones are fetched
+            with self.metrics.phase("download"):
+                self.download_chunks(job, downloader, endpoints, station_id, from_time, lsid,
+                                     dt_from, total_duration, journal, tuner, muxer)
+            success = True
+        except Exception as e:
+            self.log(f"エラー: {e}")
+            job.error = str(e)
+
+        if success:
+            self.log("ファイルを変換中...")
+            try:
+                with self.metrics.phase("remux"):
+                    muxer.close()
+            except Exception as e:
+                self.log(f"エラー: {e}")
+                job.error = str(e)
+                success = False
+        if not success:
+            muxer.abort()
+
+        self.metrics.set_tuning(tuner)
+        if self.auto_tune:
+            self.log(f"自動調整の結果: 同時数 {tuner.concurrency}, チャンク {tuner.chunk_seconds}秒 "
+                     f"(変更 {len(tuner.changes)}回)")
+
+        # Cleanup: the journal is kept on failure so the next attempt can resume
+        if success:
+            journal.remove()
+        if success and job.day:
+            with self.metrics.phase("split"):
+                success = self.split_day(job, output_file, ffmpeg_path)
+        elif success:
+            job.output = output_file
+            job.error = None
+            if self.library:
+                self.add_to_library(job)
+            self.log(f"録音成功: {os.path.basename(output_file)}")
+        else:
+            self.log("録音に失敗しました。")
+        return success
+
+    def day_parts(self, job):
+        # One job per program of the station day in the guide, clipped to 05:00-29:00
+        _, progs = self.guide.station_programs(job.station_id, job.from_time[:8])
+        parts = []
+        for prog in progs:
+            ft, to = max(prog["ft"], job.from_time), min(prog["to"], job.to_time)
+            if ft >= to:
+                continue
+            part = RecordingJob(station_id=job.station_id, from_time=ft)
+            part.to_time = to
+            part.title = prog["title"] or "Unknown_Title"
+            parts.append(part)
+        return parts
+
+    def find_recorded(self, part):
+        # Point the part at the library's recording of exactly its range, if there is one
+        entry = self.library.covering(part.station_id, part.from_time, part.to_time)
+        if entry and entry["ft"] == part.from_time and entry["to_time"] == part.to_time:
+            part.output = entry["path"]
+            part.skipped = True
+            part.status = "done"
+        return part.skipped
+
+    def day_recorded(self, job, station_dir):
+        # True if every program of the day is in the library already, then nothing is downloaded
+        try:
+            with self.metrics.phase("guide"):
+                parts = self.day_parts(job)
+            if not parts or not all([self.find_recorded(part) for part in parts]):
+                return False
+        except Exception as e:
+            self.log(f"ライブラリ参照エラー: {e}")
+            return False
+        job.parts = parts
+        job.output = station_dir
+        job.skipped = True
+        self.log(f"1日分の全{len(parts)}番組が録音済みのためスキップ")
+        return True
+
+    def split_day(self, job, day_file, ffmpeg_path):
+        # One file per program in the guide, cut out of the day recording with stream copy.
+        # The day file is removed once every program is out; if a cut fails it is kept
+        dt_day = datetime.datetime.strptime(job.from_time, "%Y%m%d%H%M%S")
+        parts = job.parts = self.day_parts(job)
+        if not parts:
+            self.log("番組表に番組がないため分割できません。")
+            job.error = "no programs in guide"
+            return False
+
+        def split(part):
+            started = time.time()
+            if self.library and self.find_recorded(part):
+                return part
+            output_file = self.output_path(part.station_id, part.from_time, part.title)
+            ft = datetime.datetime.strptime(part.from_time, "%Y%m%d%H%M%S")
+            to = datetime.datetime.strptime(part.to_time, "%Y%m%d%H%M%S")
+            cut(ffmpeg_path, day_file, output_file, int((ft - dt_day).total_seconds()),
+                int((to - ft).total_seconds()))
+            part.output = output_file
+            part.elapsed = time.time() - started
+            if self.library:
+                self.add_to_library(part)
+            return part
+
+        self.log(f"番組ごとに分割中... ({len(parts)}番組)")
+        with ThreadPoolExecutor(max_workers=SPLIT_WORKERS) as pool:
+            futures = [(part, pool.submit(split, part)) for part in parts]
+        failed = 0
+        for part, future in futures:
+            try:
+                future.result()
+                part.status = "done"
+            except Exception as e:
+                part.status = "failed"
+                part.error = str(e)
+                failed += 1
+                self.log(f"分割エラー: {part.from_time} {part.title} ({e})")
+        if failed:
+            self.log(f"分割に失敗した番組があります ({failed}/{len(parts)})。1日分のファイルを残します: {day_file}")
+            job.error = f"split failed ({failed}/{len(parts)})"
+            return False
+        os.remove(day_file)
+        job.output = os.path.dirname(day_file)
+        job.error = None
+        skipped = sum(1 for part in parts if part.skipped)
+        self.log(f"録音成功: {len(parts)}番組に分割しました" + (f" (録音済み {skipped}番組)" if skipped else ""))
+        return True
@@ -0,0 +1,188 @@
+"""Program search over the area guides of the past days, with an in-memory inverted index."""
+
+import os
+import re
+import time
+import datetime
+import threading
+import unicodedata
+from array import array
+
+from .config import SEARCH_DAYS, SEARCH_WORKERS, SEARCH_LIMIT
+
+WORD = re.compile(r"\w+")
+TAG = re.compile(r"<[^>]+>")
+
+
+def normalize(text):
+    # Full-width/half-width and case folded, so "ＴＢＳ", "tbs" and "TBS" are the same
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def ngrams(text):
+    # Character unigrams and bigrams of every word: Japanese has no spaces to split on,
+    # and bigrams let any substring of two or more characters be looked up
+    grams = set()
+    for word in WORD.findall(text):
+        grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return grams
+
+
+def query_grams(term):
+    # The fewest grams that must all be in a document containing `term`
+    grams = set()
+    for word in WORD.findall(term):
+        if len(word) == 1:
+            grams.add(word)
+        else:
+            grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return grams
+
+
+def parse_guide(path):
+    # Every <prog> of an area guide: (station id, ft, to, title, pfm, info)
+    import xml.etree.ElementTree as ET
+    progs = []
+    station_id = None
+    with open(path, 'rb') as f:
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if elem.tag == "station":
+                if event == "start":
+                    station_id = elem.get("id")
+                else:
+                    elem.clear()
+            elif event == "end" and elem.tag == "prog":
+                progs.append((station_id, elem.get("ft"), elem.get("to"), elem.findtext("title") or "",
+                              elem.findtext("pfm") or "", elem.findtext("info") or ""))
+                elem.clear()
+    return progs
+
+
+class ProgramSearch:
+    """Programs of the past `days` days in every area of the catalog, searchable by title,
+    performer (pfm) and info.
+
+    build() fetches the area guides concurrently through ProgramGuide (so they share its disk
+    cache) and parses each guide file once; a later build() only re-parses guides that were
+    refreshed. Programs aired in several areas are indexed once. The index maps character
+    n-grams to sorted arrays of program numbers; search() intersects them and checks the
+    remaining candidates for the actual substrings.
+    """
+
+    def __init__(self, catalog, guide, days=SEARCH_DAYS, workers=SEARCH_WORKERS, log=print):
+        self.catalog = catalog
+        self.guide = guide
+        self.days = days
+        self.workers = workers
+        self.log = log
+        self.lock = threading.Lock()
+        self.parsed = {} # (date, area) -> (mtime, progs)
+        self.programs = [] # {"station_id", "ft", "to", "title", "pfm"}
+        self.texts = [] # normalized "title\npfm\ninfo" per program
+        self.titles = [] # normalized title per program, for ranking
+        self.index = {} # n-gram -> array of program numbers
+
+    def dates(self):
+        today = datetime.datetime.strptime(self.guide.guide_date(
+            datetime.datetime.now().strftime("%Y%m%d%H%M%S")), "%Y%m%d")
+        return [(today - datetime.timedelta(days=i)).strftime("%Y%m%d") for i in range(self.days)]
+
+    def _load(self, date_str, area_id):
+        path = self.guide.fetch(date_str, area_id)
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self.parsed.get((date_str, area_id))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        progs = parse_guide(path)
+        with self.lock:
+            self.parsed[(date_str, area_id)] = (mtime, progs)
+        return progs
+
+    def build(self, on_progress=None):
+        # on_progress(done, total) after every guide
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        started = time.perf_counter()
+        self.catalog.load()
+        dates = self.dates()
+        keys = [(date_str, area_id) for date_str in dates for area_id in sorted(self.catalog.by_area)]
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._load, *key) for key in keys]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.log(f"番組表取得エラー: {e}")
+                if on_progress:
+                    on_progress(done, len(keys))
+
+        # Guides that fell out of the window are not kept, in memory or on disk
+        with self.lock:
+            for key in set(self.parsed) - set(keys):
+                del self.parsed[key]
+        self.guide.prune(dates[-1])
+
+        # Only programs that have ended can be recorded
+        now = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        unique = {}
+        with self.lock:
+            parsed = [self.parsed[key][1] for key in keys if key in self.parsed]
+        for progs in parsed:
+            for prog in progs:
+                station_id, ft, to = prog[:3]
+                if ft and to and to <= now:
+                    unique.setdefault((station_id, ft), prog)
+        # Numbered newest first, so every posting list is already in result order
+        programs, texts, titles, postings = [], [], [], {}
+        for no, (station_id, ft, to, title, pfm, info) in enumerate(
+                sorted(unique.values(), key=lambda prog: prog[1], reverse=True)):
+            text = normalize(f"{title}\n{pfm}\n{TAG.sub(' ', info)}")
+            programs.append({"station_id": station_id, "ft": ft, "to": to, "title": title, "pfm": pfm})
+            texts.append(text)
+            titles.append(normalize(title))
+            for gram in ngrams(text):
+                postings.setdefault(gram, []).append(no)
+        index = {gram: array("I", numbers) for gram, numbers in postings.items()}
+        with self.lock:
+            self.programs, self.texts, self.titles, self.index = programs, texts, titles, index
+        self.log(f"番組検索の索引を作成: {len(programs)}番組, {len(keys) - failed}/{len(keys)}件の番組表 "
+                 f"({time.perf_counter() - started:.1f}秒)")
+        return len(programs)
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        # Programs containing every whitespace-separated term; title matches first, then newest
+        terms = [term for term in normalize(query).split() if WORD.search(term)]
+        if not terms:
+            return []
+        with self.lock:
+            programs, texts, titles, index = self.programs, self.texts, self.titles, self.index
+        grams = set()
+        for term in terms:
+            grams.update(query_grams(term))
+        lists = sorted((index.get(gram, ()) for gram in grams), key=len)
+        if not lists or not lists[0]:
+            return []
+        candidates = lists[0]
+        if len(lists) > 1:
+            candidates = set(candidates)
+            for numbers in lists[1:]:
+                candidates.intersection_update(numbers)
+                if not candidates:
+                    return []
+            candidates = sorted(candidates)
+        # A term that is a single gram needs no check: its posting list is exactly its matches
+        exact = all(len(term) <= 2 and term in grams for term in terms)
+        in_title, others = [], []
+        for no in candidates:
+            if not exact and not all(term in texts[no] for term in terms):
+                continue
+            if any(term in titles[no] for term in terms):
+                in_title.append(no)
+                if len(in_title) == limit:
+                    break
+            elif len(others) < limit:
+                others.append(no)
+        return [programs[no] for no in (in_title + others)[:limit]]
@@ -0,0 +1,111 @@
+"""Adaptive chunk length and download concurrency (additive increase, multiplicative decrease)."""
+
+import time
+import threading
+
+from .config import MAX_CONCURRENCY, MIN_CHUNK_SECONDS, MAX_CHUNK_SECONDS
+
+# Chunk lengths stay a multiple of the HLS segment length
+SEGMENT_SECONDS = 5
+# Window throughput must beat the previous one by this much for another step up in concurrency
+SCALING_GAIN = 1.1
+# After a step up that did not pay off, windows to wait before probing again
+PROBE_INTERVAL = 4
+
+
+class ChunkTuner:
+    """Chooses the chunk length and the number of chunks in flight from measured throughput.
+
+    Concurrency grows by one per window while the aggregate throughput keeps rising; a step that
+    did not pay off is taken back and probed again later. A clean window also lengthens chunks
+    (fewer playlist round trips).
+    An error halves both, at most once per round of chunks already in flight.
+    With `adaptive=False` the starting values are kept.
+    """
+
+    def __init__(self, concurrency, chunk_seconds, min_concurrency=1, max_concurrency=MAX_CONCURRENCY,
+                 min_chunk_seconds=MIN_CHUNK_SECONDS, max_chunk_seconds=MAX_CHUNK_SECONDS, chunk_step=60, adaptive=True, log=None):
+        self.lock = threading.Lock()
+        self.adaptive = adaptive
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.min_chunk_seconds = self._round(min_chunk_seconds)
+        self.max_chunk_seconds = max(self.min_chunk_seconds, self._round(max_chunk_seconds))
+        self.chunk_step = self._round(chunk_step)
+        self.concurrency = self._clamp(concurrency, self.min_concurrency, self.max_concurrency)
+        self.chunk_seconds = self._clamp(self._round(chunk_seconds), self.min_chunk_seconds, self.max_chunk_seconds)
+        self.log = log or (lambda message: None)
+        self.changes = [] # {"time", "concurrency", "chunk_seconds", "throughput_bps", "reason"}
+        self.last_decrease = 0.0
+        self.grew = False # the last window ended with a concurrency step up
+        self.hold = 0 # windows left before the next probe
+        self.previous_bps = 0.0
+        self._reset_window()
+
+    @staticmethod
+    def _round(seconds):
+        return max(SEGMENT_SECONDS, int(seconds) // SEGMENT_SECONDS * SEGMENT_SECONDS)
+
+    @staticmethod
+    def _clamp(value, low, high):
+        return min(high, max(low, int(value)))
+
+    def _reset_window(self):
+        self.window_started = time.perf_counter()
+        self.window_bytes = 0
+        self.window_chunks = 0
+        self.window_errors = 0
+
+    def _change(self, concurrency, chunk_seconds, bps, reason):
+        if concurrency == self.concurrency and chunk_seconds == self.chunk_seconds:
+            return
+        self.log(f"自動調整 ({reason}): 同時数 {self.concurrency}→{concurrency}, "
+                 f"チャンク {self.chunk_seconds}→{chunk_seconds}秒 ({bps / 1048576:.2f} MiB/s)")
+        self.concurrency, self.chunk_seconds = concurrency, chunk_seconds
+        self.changes.append({"time": round(time.time(), 3), "concurrency": concurrency,
+                             "chunk_seconds": chunk_seconds, "throughput_bps": round(bps), "reason": reason})
+
+    def on_success(self, nbytes):
+        if not self.adaptive:
+            return
+        with self.lock:
+            self.window_bytes += nbytes
+            self.window_chunks += 1
+            # A window is one round of chunks at the current concurrency (at least two)
+            if self.window_chunks < max(2, self.concurrency):
+                return
+            bps = self.window_bytes / max(time.perf_counter() - self.window_started, 1e-6)
+            concurrency, chunk_seconds = self.concurrency, self.chunk_seconds
+            reason = "増加"
+            if self.window_errors == 0:
+                if self.hold:
+                    self.hold -= 1
+                elif not self.grew or bps > self.previous_bps * SCALING_GAIN:
+                    concurrency = min(self.max_concurrency, concurrency + 1)
+                else:
+                    concurrency = max(self.min_concurrency, concurrency - 1)
+                    self.hold = PROBE_INTERVAL
+                    reason = "頭打ち"
+                chunk_seconds = min(self.max_chunk_seconds, chunk_seconds + self.chunk_step)
+            self.grew = concurrency > self.concurrency
+            self.previous_bps = bps
+            self._change(concurrency, chunk_seconds, bps, reason)
+            self._reset_window()
+
+    def on_error(self, started):
+        # `started` is when the failed attempt began; failures of requests that were already
+        # in flight at the last decrease belong to the same congestion event
+        if not self.adaptive:
+            return
+        with self.lock:
+            self.window_errors += 1
+            if started < self.last_decrease:
+                return
+            bps = self.window_bytes / max(time.perf_counter() - self.window_started, 1e-6)
+            self._change(max(self.min_concurrency, self.concurrency // 2),
+                         max(self.min_chunk_seconds, self._round(self.chunk_seconds // 2)), bps, "エラー")
+            self.last_decrease = time.perf_counter()
+            self.grew = False
+            self.hold = 0
+            self.previous_bps = 0.0
+            self._reset_window()
@@ -0,0 +1,90 @@
+"""Background warm-up: everything a recording needs before its first chunk, done ahead of time."""
+
+import time
+import datetime
+import threading
+
+from .config import WARMUP_WORKERS
+from .recorder import find_ffmpeg
+
+
+class Warmup:
+    """Runs the slow preparation steps of a recording in the background and keeps the results
+    in the shared auth, catalog, guide and stream objects, where Recorder picks them up.
+
+    Tasks are keyed, so asking for the same station again while it is being warmed is a no-op.
+    Failures are only logged; the recording does the same step again in the foreground.
+    """
+
+    def __init__(self, auth, catalog, guide, streams, log, workers=WARMUP_WORKERS):
+        from concurrent.futures import ThreadPoolExecutor
+        self.auth = auth
+        self.catalog = catalog
+        self.guide = guide
+        self.streams = streams
+        self.log = log
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup")
+        self.lock = threading.Lock()
+        self.running = {} # key -> future
+        self.ffmpeg_path = None
+
+    def submit(self, key, fn, *args):
+        with self.lock:
+            future = self.running.get(key)
+            if future is not None and not future.done():
+                return future
+            future = self.running[key] = self.executor.submit(self._run, key, fn, *args)
+            return future
+
+    def _run(self, key, fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            self.log(f"事前準備エラー ({key}): {e}")
+            return None
+
+    def start(self, mail, password, ffmpeg_path=None, recent=(), on_catalog=None):
+        # At launch: ffmpeg, auth and the station list at once, then the recent stations
+        started = time.perf_counter()
+        self.submit("ffmpeg", self._resolve_ffmpeg, ffmpeg_path)
+        self.submit("catalog", self._load_catalog, on_catalog)
+        auth = self.submit("auth", self.auth.ensure, mail, password)
+        stations = [self.warm_station(station_id) for station_id in recent]
+        stations = [future for future in stations if future is not None]
+
+        def report():
+            auth.result()
+            for future in stations:
+                future.result()
+            self.log(f"事前準備完了 ({time.perf_counter() - started:.1f}秒)")
+
+        threading.Thread(target=report, daemon=True).start()
+
+    def _resolve_ffmpeg(self, configured):
+        self.ffmpeg_path = find_ffmpeg(configured)
+        return self.ffmpeg_path
+
+    def _load_catalog(self, on_catalog):
+        self.catalog.load()
+        if on_catalog:
+            on_catalog(self.catalog.stations)
+
+    def warm_station(self, station_id, time_str=None):
+        # Guide of the day `time_str` falls in (today by default) and the stream XML of the station.
+        # A time still being typed is ignored
+        if not time_str:
+            time_str = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        try:
+            date_str = self.guide.guide_date(time_str)
+        except ValueError:
+            return None
+        return self.submit(f"{station_id}/{date_str}", self._warm_station, station_id, date_str)
+
+    def _warm_station(self, station_id, date_str):
+        if self.catalog.get(station_id) is None:
+            return
+        self.guide.station_programs(station_id, date_str)
+        self.streams.get(station_id)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,157 @@
+#
+# End-to-end checks of the recording path against bench/fake_radiko.py and the copying
+# stand-in ffmpeg: resuming from the journal, per-chunk endpoint failover and token refresh.
+# Every frame the fake server sends is stamped with its position, so the output can be
+# checked for missing, duplicated or reordered audio.
+#
+# Usage:
+#   python -m unittest discover tests
+#
+
+import os
+import sys
+import glob
+import json
+import time
+import struct
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fake_radiko import start_server, FRAMES_PER_SEGMENT, SEGMENT_SECONDS
+from bench_recording import stand_in_ffmpeg
+from radirec.batch import BatchScheduler
+from radirec.recorder import Recorder, RecordingJob
+
+FROM_TIME = "202601010500"
+
+
+def frame_stamps(path):
+    # (second, frame) of every ADTS frame in the output, in file order
+    with open(path, "rb") as f:
+        data = f.read()
+    stamps = []
+    pos = 0
+    while pos + 13 <= len(data):
+        if data[pos] != 0xFF or data[pos + 1] & 0xF0 != 0xF0:
+            raise AssertionError(f"No ADTS frame at byte {pos}")
+        stamps.append(struct.unpack(">IH", data[pos + 7:pos + 13]))
+        pos += ((data[pos + 3] & 0x03) << 11) | (data[pos + 4] << 3) | (data[pos + 5] >> 5)
+    return stamps
+
+
+def expected_stamps(from_time, minutes):
+    start = datetime.datetime.strptime(from_time, "%Y%m%d%H%M") - datetime.datetime(2000, 1, 1)
+    first = int(start.total_seconds())
+    return [(second, frame) for second in range(first, first + minutes * 60, SEGMENT_SECONDS)
+            for frame in range(FRAMES_PER_SEGMENT)]
+
+
+class RecordingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        # Work, cache and output folders are relative to the current directory
+        os.chdir(self.tmp.name)
+        self.ffmpeg = stand_in_ffmpeg(self.tmp.name)
+        self.logs = []
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def start(self, **options):
+        self.server, self.state = start_server(**options)
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        return {"radiko_url": url, "radiko_api_url": url, "ffmpeg_path": self.ffmpeg, "metrics_file": "",
+                "library_file": "", "spool": "disk", "auto_tune": False, "concurrency": 3, "chunk_seconds": 300}
+
+    def record(self, config, minutes=30):
+        job = RecordingJob("TBS", FROM_TIME, minutes)
+        BatchScheduler(config, 1, log=self.logs.append).run([job])
+        return job
+
+    def logged(self, text):
+        return [message for message in self.logs if text in message]
+
+    def assertComplete(self, job, minutes=30):
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual(frame_stamps(job.output), expected_stamps(FROM_TIME, minutes))
+
+    def test_resume_reuses_journaled_chunks(self):
+        config = self.start()
+        download_chunk = Recorder.download_chunk
+        fail = {"no": 1}
+
+        def failing(recorder, *args):
+            chunk = args[5]
+            if chunk["no"] == fail["no"]:
+                # Long enough for the other workers to finish their chunks
+                time.sleep(0.5)
+                raise Exception("injected")
+            return download_chunk(recorder, *args)
+
+        with mock.patch.object(Recorder, "download_chunk", failing):
+            job = self.record(config)
+        self.assertEqual(job.status, "failed")
+        journals = glob.glob(os.path.join(".radirec_work", "*", "journal.json"))
+        self.assertEqual(len(journals), 1)
+        with open(journals[0], encoding="utf-8") as f:
+            journaled = json.load(f)["chunks"]
+        self.assertGreaterEqual(len(journaled), 2)
+        # The failed chunk (05:05-05:10) is missing, so the journaled ones after it need aligning
+        self.assertNotIn("20260101050500", journaled)
+
+        # A different chunk length: new chunks must end where the journaled ones start
+        config["chunk_seconds"] = 240
+        fail["no"] = None
+        with mock.patch.object(Recorder, "download_chunk", failing):
+            job = self.record(config)
+        self.assertComplete(job)
+        self.assertTrue(self.logged(f"取得済みチャンクを再利用: {len(journaled)}/"), self.logs)
+        self.assertEqual(glob.glob(os.path.join(".radirec_work", "*")), [])
+
+    def test_failing_endpoint_fails_over_per_chunk(self):
+        config = self.start(endpoint_fail_rates=(1.0, 0.0))
+        # Without the probe the failing endpoint is ranked first, so the chunks have to move off it
+        with mock.patch.object(Recorder, "probe_endpoints"):
+            started = time.perf_counter()
+            job = self.record(config)
+        self.assertComplete(job)
+        switches = self.logged("切り替え")
+        self.assertTrue(switches, self.logs)
+        self.assertTrue(all("/tf1/" in message for message in switches), switches)
+        self.assertFalse(self.logged("Download failed"))
+        # Failing over to an untried endpoint does not wait
+        self.assertLess(time.perf_counter() - started, 10)
+
+    def test_revoked_token_is_refreshed_once(self):
+        config = self.start()
+        download_chunk = Recorder.download_chunk
+        revoked = []
+
+        def revoking(recorder, *args):
+            if args[5]["no"] == 2 and not revoked:
+                with self.state.lock:
+                    self.state.tokens.clear()
+                revoked.append(True)
+            return download_chunk(recorder, *args)
+
+        with mock.patch.object(Recorder, "download_chunk", revoking):
+            job = self.record(config)
+        self.assertComplete(job)
+        self.assertTrue(self.logged("403"), self.logs)
+        self.assertEqual(len(self.logged("認証中")), 2, self.logs)
+
+
+if __name__ == "__main__":
+    unittest.main()